@@ -0,0 +1,310 @@
+#Modo de servicio asincrono (ASGI) para los endpoints de chat, PDF y busqueda
+#Las llamadas a Groq usan httpx y la BD un engine asincrono, asi un proceso puede mantener cientos de
+#conversaciones en vuelo sin ocupar un hilo por cada una. El resto de rutas se sirven con la app Flask.
+#Uso: uvicorn asgi:app --port 5000
+import startup
+startup.begin() #el perfil de arranque (STARTUP_PROFILE=1) tambien cuenta los imports de Starlette
+import json
+from contextlib import asynccontextmanager
+import anyio
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+import server
+from chat_store import DEFAULT_SESSION
+from db_pool import async_engine_options
+from pdf_jobs import QueueFull
+from pdf_extract import PDF_MAX_REQUEST_BYTES, aextractChunks, aspoolUpload, removeSpool, sizeMessage, shutdown as shutdown_extract
+from password_hashing import shutdown as shutdown_hashing
+from pdf_summary import asummarize
+from catalog_results import compactRows, templateAnswer
+from consultas_writer import days, insertStatement, messages, row as consultaRow
+from sql_guard import UnsafeQuery, checkCost, explainStatement, guardQuery, timeoutStatement
+from server import app as flask_app, groq, GroqError, Consultas
+from metrics import span
+import metrics
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+#Convierte la URI de la BD de Flask a su driver asincrono
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+engine = create_async_engine(async_url(server.DATABASE_URL), **async_engine_options(flask_app.config['SQLALCHEMY_ENGINE_OPTIONS']))
+#Igual que en Flask, las busquedas del catalogo usan su propio pool de solo lectura
+catalog_options = dict(flask_app.config['SQLALCHEMY_BINDS']['catalog'])
+catalog_engine = create_async_engine(async_url(catalog_options.pop('url')), **async_engine_options(catalog_options))
+
+#Ejecuta una funcion bloqueante de server.py en un hilo, dentro del contexto de la app Flask
+async def run_sync(fn, *args):
+    def call():
+        with flask_app.app_context():
+            return fn(*args)
+    return await anyio.to_thread.run_sync(call)
+
+#Id de la sesion del invitado que hace la peticion
+def guestSession(request):
+    return request.headers.get('X-Session-Id') or DEFAULT_SESSION
+
+#Guarda un turno (filas de consultaRow) en una transaccion con sus dias en consultas_dias, retorna los mensajes con id
+#Con CONSULTAS_BATCH=1 se une a los lotes del escritor de server.py, que corre en su propio hilo
+async def saveTurn(rows):
+    with span('db_save'):
+        if server.consultas_writer.batch:
+            return await anyio.to_thread.run_sync(server.consultas_writer.save, rows)
+        async with engine.begin() as conn:
+            ids = (await conn.execute(insertStatement(Consultas.__table__), rows)).scalars().all()
+            await conn.execute(server.consultaDias(conn.dialect.name, days(rows)))
+    return messages(rows, ids)
+
+#Version asincrona de server.cacheTokens
+async def cacheTokens(tokens, prompt, userMessage):
+    parts = []
+    async for token in tokens:
+        parts.append(token)
+        yield token
+    server.response_cache.put(prompt, userMessage, ''.join(parts))
+
+#Recorre los tokens de Groq y si falla la conexion envia el mensaje de error en su lugar
+async def streamTokens(tokens, errorMessage):
+    try:
+        async for token in tokens:
+            yield token
+    except GroqError as e:
+        print("Groq error:", str(e))
+        yield errorMessage
+
+#Envia la respuesta como server-sent events y al terminar la guarda con saveAnswer
+def streamAnswer(tokens, saveAnswer):
+    async def events():
+        parts = []
+        if isinstance(tokens, str):
+            parts.append(tokens)
+            yield 'data: ' + json.dumps({"token": tokens}) + '\n\n'
+        else:
+            async for token in tokens:
+                parts.append(token)
+                yield 'data: ' + json.dumps({"token": token}) + '\n\n'
+        try:
+            saved = await saveAnswer(''.join(parts))
+            done = {"done": True, "messages": saved} if saved else {"done": True}
+            yield 'data: ' + json.dumps(done) + '\n\n'
+        except Exception as e:
+            print(e)
+            yield 'data: ' + json.dumps({"done": True, "error": str(e)}) + '\n\n'
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+#Version asincrona de server.generateAnswer
+async def generateAnswer(userOpt, userMessage, stream=False):
+    if userOpt == "📖 Buscar libros o recursos":
+        return await human_query(userMessage, stream)
+    prompt = server.promptOptions(userOpt)
+    cached = server.response_cache.get(prompt, userMessage, userOpt in server.NEAR_CACHE_OPTIONS)
+    if cached is not None:
+        return cached
+    if not groq.available():
+        return server.degradedAnswer(prompt, userMessage)
+    messages = server.chatMessages(prompt, userMessage)
+    if stream:
+        return streamTokens(cacheTokens(groq.astream(messages, name="chat"), prompt, userMessage), "Error al generar respuesta de IA.")
+    try:
+        reply = await groq.achat(messages, name="chat")
+        server.response_cache.put(prompt, userMessage, reply)
+        return reply
+    except GroqError as e:
+        print("Groq error:", str(e))
+        return server.degradedAnswer(prompt, userMessage)
+
+#Version asincrona de server.build_answer
+async def build_answer(result, userQuestion, stream=False):
+    messages = server.answerMessages(result, userQuestion)
+    if stream:
+        return streamTokens(groq.astream(messages, name="build_answer"), "Error al generar la respuesta.")
+    try:
+        return await groq.achat(messages, name="build_answer")
+    except GroqError as e:
+        print("Error:", str(e))
+        return "Error al generar la respuesta."
+
+#Version asincrona de server.human_query
+async def human_query(userQuestion, stream=False):
+    with span('catalog_index'):
+        answer = server.catalog_index.answer(userQuestion) if server.CATALOG_FAST_PATH else None  #busqueda en memoria, sin E/S
+    if answer:
+        return answer
+    plan = server.plan_cache.match(userQuestion)
+    if plan:
+        sql_query, params = plan
+        result_dict = {"sql_query": sql_query}
+    elif not groq.available():
+        return server.DEGRADED_MESSAGE
+    else:
+        params = None
+        messages = await run_sync(server.sqlMessages, userQuestion)  #el esquema se lee de la BD
+        try:
+            sql_query = await groq.achat(messages, name="nl_to_sql")
+        except GroqError as e:
+            print("Error:", str(e))
+            sql_query = "Error al generar consulta."
+        result_dict = server.parse_sql_response(sql_query)
+    if result_dict and "SELECT" in result_dict["sql_query"].upper():
+        try:
+            result = await execute_query(result_dict["sql_query"], params)
+            if result and params is None:
+                server.plan_cache.learn(userQuestion, result_dict["sql_query"])
+            return templateAnswer(result) or await build_answer(compactRows(result), userQuestion, stream)
+        except UnsafeQuery as e:
+            print(f"SQL rechazado: {e}")
+            return server.SQL_REJECTED
+        except Exception as e:
+            print(f"Error al ejecutar SQL: {e}")
+            return "Hubo un problema al ejecutar la consulta SQL."
+    raw_text = result_dict["sql_query"] if result_dict else sql_query
+    return await build_answer(raw_text, userQuestion, stream)
+
+#Version asincrona de server.execute_query
+async def execute_query(sql_query, params=None):
+    dialect = catalog_engine.dialect.name
+    sql_query = guardQuery(sql_query, await run_sync(server.catalogColumns), dialect)
+    try:
+        with span('sql'):
+            async with catalog_engine.connect() as connection:
+                timeout = timeoutStatement(dialect)
+                if timeout:
+                    await connection.execute(text(timeout))
+                explain = explainStatement(dialect, sql_query)
+                if explain:
+                    checkCost((await connection.execute(text(explain), params or {})).scalar())
+                result = await connection.execute(text(sql_query), params or {})
+                return [dict(row._mapping) for row in result]
+    except SQLAlchemyError as e:
+        print(f"Error al ejecutar la consulta: {e}")
+        return []
+
+async def send_message_json(request):
+    data = await request.json()
+    userMessage = data.get('message')
+    session_id = guestSession(request)
+    userOption = data.get('option') or await run_sync(server.chat_store.get_option, 'guest:' + session_id)
+    question = {'type': 0, 'message': userMessage}
+    if data.get('stream'):
+        async def save_json(response):
+            with span('chat_store'):
+                await run_sync(server.chat_store.append, session_id, [question, {'type': 1, 'message': response}])
+        return streamAnswer(await generateAnswer(userOption, userMessage, stream=True), save_json)
+    response = await generateAnswer(userOption, userMessage)
+    with span('chat_store'):
+        await run_sync(server.chat_store.append, session_id, [question, {'type': 1, 'message': response}])
+    return JSONResponse(await run_sync(server.chat_store.get, session_id))
+
+async def send_message_db(request):
+    data = await request.json()
+    userMessage = data.get('userMessage')
+    userOption = data.get('option') or await run_sync(server.chat_store.get_option, 'user:' + str(data.get('userId')))
+    question = consultaRow(data['userId'], data['name'], userMessage, 0)  #se guarda junto con la respuesta
+    try:
+        if data.get('stream'):
+            async def save_db(response):
+                return await saveTurn([question, consultaRow(data['userId'], 'BAGBOT', response, 1)])
+            return streamAnswer(await generateAnswer(userOption, userMessage, stream=True), save_db)
+        response = await generateAnswer(userOption, userMessage)
+        saved = await saveTurn([question, consultaRow(data['userId'], 'BAGBOT', response, 1)])
+        return JSONResponse({"message": "Consulta guardada correctamente", "messages": saved}, 201)
+    except Exception as e:
+        print(e)
+        return JSONResponse({"error": str(e)}, 500)
+
+async def upload_pdf(request):
+    #Starlette guarda todo el formulario antes de entregarlo: con Content-Length se rechaza sin leer el cuerpo.
+    #Las subidas sin Content-Length (chunked) las corta el limite de bytes al copiar el archivo
+    if int(request.headers.get('content-length') or 0) > PDF_MAX_REQUEST_BYTES:
+        return JSONResponse({"error": sizeMessage()}, 413)
+    form = await request.form()
+    file = form.get('file')
+    user_id = form.get('userID')
+    is_logged_in = str(form.get('loggedIn')).lower() == 'true'
+    if not file or isinstance(file, str):
+        return JSONResponse({"error": "No se encontró el archivo."}, 400)
+    filename = file.filename
+    try:
+        path, pdf_hash = await aspoolUpload(file)  #la subida se copia a un temporal por partes
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, 400)
+    if str(form.get('async')).lower() == 'true':  #modo trabajo en segundo plano, el estado se consulta en /pdf-jobs/<id>
+        try:
+            job_id = server.pdf_jobs.submit(server.processPdf, path, pdf_hash, filename, is_logged_in, user_id, guestSession(request), filename=filename)
+        except QueueFull:
+            removeSpool(path)
+            return JSONResponse({"error": "⚠️ Hay muchos PDF en proceso, intenta de nuevo en unos segundos."}, 429, headers={'Retry-After': '10'})
+        return JSONResponse({"status": "queued", "job_id": job_id, "filename": filename}, 202)
+    try:
+        resumen = await run_sync(server.summary_store.get, pdf_hash)  #PDF identico ya resumido: sin llamada a la IA
+        if resumen is None:
+            try:
+                with span('pdf_extract'):
+                    chunks = await aextractChunks(path)  #PyMuPDF corre en el pool de procesos, fuera del event loop
+            except ValueError as e:
+                return JSONResponse({"error": str(e)}, 400)
+            try:
+                with span('pdf_summary'):
+                    resumen = await asummarize(groq, chunks)
+                await run_sync(server.summary_store.put, pdf_hash, resumen)
+            except GroqError as e:
+                print("Error:", str(e))
+                resumen = server.PDF_SUMMARY_ERROR
+    finally:
+        removeSpool(path)
+    summary_id = None
+    if resumen != server.PDF_SUMMARY_ERROR:
+        owner = server.summaryOwner(is_logged_in, user_id, guestSession(request))
+        summary_id = await run_sync(server.summary_store.link, pdf_hash, owner, filename)
+    if not is_logged_in:
+        await run_sync(server.addResumenJson, filename, resumen, guestSession(request))
+    else:
+        try:
+            await saveTurn([consultaRow(user_id, 'BAGBOT', server.resumenMessage(filename, resumen), 1)])
+        except SQLAlchemyError as e:
+            print(e)
+    return JSONResponse({"status": "ok", "filename": filename, "summary_id": summary_id}, 200)
+
+#Mide las rutas asincronas igual que los hooks de Flask miden las demas
+def timed(route, endpoint):
+    async def handler(request):
+        token = metrics.startRequest(request.method, route)
+        status = 500
+        try:
+            response = await endpoint(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.endRequest(token, status)
+    return handler
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await anyio.to_thread.run_sync(server.consultas_writer.close)  #lotes de consultas pendientes
+    await groq.aclose()
+    await engine.dispose()
+    await catalog_engine.dispose()
+    shutdown_extract()
+    shutdown_hashing()
+
+app = Starlette(
+    routes=[
+        Route('/send-message-json', timed('/send-message-json', send_message_json), methods=['POST']),
+        Route('/send-message-db', timed('/send-message-db', send_message_db), methods=['POST']),
+        Route('/upload-pdf', timed('/upload-pdf', upload_pdf), methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app))  #las demas rutas siguen en Flask
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
@@ -0,0 +1,62 @@
+#Benchmark de las busquedas simples del catalogo: consulta LIKE '%x%' sobre la tabla (lo que genera la IA)
+#contra el indice en memoria de catalog_index (sin contar las dos llamadas a la IA que el indice evita)
+#Uso: python bench/catalog_bench.py --rows 100000 --repeat 200
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from common import BACKEND_DIR, summarize, print_row
+
+AUTHORS = ['Gabriel García Márquez', 'Jorge Luis Borges', 'Pedro López', 'Ana Pérez', 'Rómulo Gallegos', 'Teresa de la Parra']
+SUBJECTS = ['Matemáticas', 'Historia', 'Física', 'Agronomía', 'Literatura', 'Derecho']
+WORDS = ['introducción', 'álgebra', 'suelos', 'química', 'venezuela', 'cálculo', 'novela', 'ensayos', 'petróleo', 'economía']
+
+def generate(path, rows, seed=1):
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE recursos_libros (id INTEGER PRIMARY KEY, titulo TEXT, autor TEXT, materia TEXT, ubicacion TEXT)")
+    conn.executemany("INSERT INTO recursos_libros (titulo, autor, materia, ubicacion) VALUES (?, ?, ?, ?)",
+                     [(' '.join(rnd.sample(WORDS, 3)).capitalize(), rnd.choice(AUTHORS), rnd.choice(SUBJECTS), f"Estante {i % 40}") for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+def measure(fn, repeat):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, 0, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'catalog.db')
+    generate(path, args.rows)
+    os.environ.update(DATABASE_URL='sqlite:///' + path, CATALOG_DATABASE_URL='sqlite:///' + path, CHAT_STORE='memory', GROQ_API_KEY='bench')
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+
+    searches = [("libros del autor Gallegos", "SELECT * FROM recursos_libros WHERE UPPER(autor) LIKE UPPER('%Gallegos%') LIMIT 15"),
+                ("libros sobre agronomia", "SELECT * FROM recursos_libros WHERE UPPER(materia) LIKE UPPER('%Agronom%') LIMIT 15"),
+                ("libros titulados calculo novela", "SELECT * FROM recursos_libros WHERE UPPER(titulo) LIKE UPPER('%lculo%') AND UPPER(titulo) LIKE UPPER('%novela%') LIMIT 15")]
+    #SQLite no tiene UNACCENT, el LIKE es una aproximacion del costo del recorrido de la tabla
+    start = time.perf_counter()
+    server.catalog_index._build()
+    print(f"indice: {args.rows} filas en {time.perf_counter() - start:.2f}s")
+    with server.app.app_context():
+        for message, sql in searches:
+            print_row(f"SQL  {message[:22]}", measure(lambda: server.execute_query(sql), args.repeat))
+            print_row(f"idx  {message[:22]}", measure(lambda: server.catalog_index.answer(message), args.repeat))
+    print(server.catalog_index.stats())
+
+if __name__ == '__main__':
+    main()
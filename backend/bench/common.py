@@ -0,0 +1,65 @@
+#Utilidades compartidas por los benchmarks: levantar procesos, esperar puertos y calcular percentiles
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Argumentos de python para servir la app en un puerto: servidor de desarrollo Flask o modo ASGI (uvicorn asgi:app)
+SERVERS = {
+    "flask": lambda port: ["-c", f"import logging, server; logging.getLogger('werkzeug').setLevel(logging.ERROR); server.app.run(port={port}, threaded=True)"],
+    "asgi": lambda port: ["-m", "uvicorn", "asgi:app", "--port", str(port), "--log-level", "warning", "--backlog", "4096"]
+}
+
+#Inicia un proceso de python en la carpeta backend con variables de entorno adicionales; stdout puede ser un archivo de log
+def start_process(args, env=None, stdout=None):
+    full_env = dict(os.environ, **(env or {}))
+    #grupo de procesos propio, asi stop_process tambien termina los pools de procesos que cree el servidor
+    return subprocess.Popen([sys.executable] + args, cwd=BACKEND_DIR, env=full_env, stdout=stdout, stderr=stdout, start_new_session=True)
+
+#Espera hasta que el puerto acepte conexiones
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"El puerto {port} no respondio en {timeout}s")
+
+def stop_process(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+#Resume una corrida: peticiones correctas, errores, throughput y percentiles en ms
+def summarize(latencies, errors, elapsed):
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50) * 1000,
+        "p95": percentile(latencies, 95) * 1000,
+        "p99": percentile(latencies, 99) * 1000
+    }
+
+def print_row(label, result):
+    print(f"{label:<28} ok={result['ok']:<5} err={result['errors']:<4} "
+          f"rps={result['rps']:8.1f}  p50={result['p50']:8.1f}ms  p95={result['p95']:8.1f}ms  p99={result['p99']:8.1f}ms")
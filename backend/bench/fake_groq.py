@@ -0,0 +1,69 @@
+#Servidor falso compatible con la API de chat de Groq/OpenAI para los benchmarks
+#Simula la latencia hasta el primer token y la velocidad de generacion, con y sin stream.
+#A los mensajes de NL->SQL (piden "sql_query") responde una busqueda por titulo con la ultima palabra de la pregunta.
+#Tambien puede inyectar fallas: respuestas 429 (con Retry-After) o 503 y peticiones lentas, para probar la resiliencia
+#Uso: python bench/fake_groq.py --port 8900 --latency 0.5 --tokens 120 --tokens-per-second 400 --error-rate 0.2 --slow-rate 0.05
+import argparse
+import asyncio
+import json
+import random
+import re
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+config = {"latency": 0.5, "tokens": 120, "tokens_per_second": 400.0,
+          "error_rate": 0.0, "error_status": 429, "retry_after": None, "slow_rate": 0.0, "slow_latency": 5.0}
+
+WORDS = ("La Biblioteca Alonso Gamero ofrece servicios de préstamo, consulta en sala "
+         "y acceso a recursos digitales para la comunidad de la Facultad de Ciencias").split()
+
+#Texto de respuesta con la cantidad de tokens configurada (una palabra = un token)
+def reply_tokens(messages):
+    if '"sql_query"' in messages[0]["content"]:
+        words = re.findall(r"\w+", messages[-1]["content"])
+        sql = f"SELECT * FROM recursos_libros WHERE UPPER(UNACCENT(titulo)) LIKE UPPER(UNACCENT('%{words[-1] if words else ''}%')) LIMIT 15"
+        return [json.dumps({"sql_query": sql})]
+    return [WORDS[i % len(WORDS)] + " " for i in range(config["tokens"])]
+
+async def completions(request):
+    body = await request.json()
+    if random.random() < config["error_rate"]:
+        headers = {"Retry-After": str(config["retry_after"])} if config["retry_after"] is not None else {}
+        return JSONResponse({"error": {"message": "falla inyectada"}}, status_code=config["error_status"], headers=headers)
+    tokens = reply_tokens(body["messages"])
+    slow = random.random() < config["slow_rate"]
+    await asyncio.sleep(config["slow_latency"] if slow else config["latency"])
+    delay = 1 / config["tokens_per_second"] if config["tokens_per_second"] else 0
+    usage = {"prompt_tokens": sum(len(m["content"].split()) for m in body["messages"]), "completion_tokens": len(tokens)}
+    if body.get("stream"):
+        async def events():
+            for token in tokens:
+                yield "data: " + json.dumps({"choices": [{"delta": {"content": token}}]}) + "\n\n"
+                await asyncio.sleep(delay)
+            #como Groq, el ultimo evento no trae texto y reporta los tokens en x_groq.usage
+            yield "data: " + json.dumps({"choices": [{"delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}) + "\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+    await asyncio.sleep(delay * len(tokens))
+    return JSONResponse({"choices": [{"message": {"role": "assistant", "content": "".join(tokens)}}], "usage": usage})
+
+app = Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=config["latency"], help="segundos hasta el primer token")
+    parser.add_argument("--tokens", type=int, default=config["tokens"], help="tokens por respuesta")
+    parser.add_argument("--tokens-per-second", type=float, default=config["tokens_per_second"])
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraccion de peticiones que fallan")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None, help="segundos del encabezado Retry-After en las fallas")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraccion de peticiones lentas")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="segundos hasta el primer token de las peticiones lentas")
+    args = parser.parse_args()
+    config.update(latency=args.latency, tokens=args.tokens, tokens_per_second=args.tokens_per_second,
+                  error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+                  slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", backlog=4096)
@@ -0,0 +1,105 @@
+#Benchmark del historial (/dates y /query/<date>) con un millon de consultas sinteticas en SQLite
+#"antes": tabla sin indice y las consultas originales con date(fecha_creacion)
+#"despues": indice (usuario_id, fecha_creacion), rangos semiabiertos y el resumen consultas_dias
+#Uso: python bench/history_bench.py --rows 1000000 --users 1000 --requests 200
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from common import BACKEND_DIR, summarize, print_row
+
+#Crea la tabla consultas como estaba antes (sin indices) y la llena con mensajes repartidos en un año
+def generate(path, rows, users, seed=1):
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE consultas (id INTEGER PRIMARY KEY, usuario_id VARCHAR(255) NOT NULL, nombre VARCHAR(255) NOT NULL, "
+                 "descripcion TEXT NOT NULL, fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP, tipo INTEGER NOT NULL)")
+    batch = []
+    for i in range(rows):
+        date = start + timedelta(seconds=rnd.randrange(365 * 86400))
+        batch.append((f"U{rnd.randrange(users):07d}", 'BAGBOT', 'mensaje de prueba ' * 5, date.strftime('%Y-%m-%d %H:%M:%S.%f'), i % 2))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO consultas (usuario_id, nombre, descripcion, fecha_creacion, tipo) VALUES (?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO consultas (usuario_id, nombre, descripcion, fecha_creacion, tipo) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+#Rutas con el codigo original de /dates y /query/<date>, para medir el "antes" en las mismas condiciones
+def add_old_routes(server):
+    from flask import jsonify, request
+    from sqlalchemy import desc
+    db, Consultas = server.db, server.Consultas
+
+    @server.app.route('/bench/dates-old')
+    def dates_old():
+        dates = db.session.query(db.func.date(Consultas.fecha_creacion)).filter(
+            Consultas.usuario_id == request.args.get('user_id')
+        ).distinct().order_by(desc(db.func.date(Consultas.fecha_creacion))).all()
+        return jsonify([d[0] for d in dates])
+
+    @server.app.route('/bench/query-old/<date>')
+    def query_old(date):
+        consultas = Consultas.query.filter(
+            db.func.date(Consultas.fecha_creacion) == date,
+            Consultas.usuario_id == request.args.get('user_id')
+        ).order_by(Consultas.fecha_creacion.asc()).all()
+        return jsonify([{'type': c.tipo, 'message': c.descripcion} for c in consultas])
+
+def measure(client, urls):
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for url in urls:
+        t = time.perf_counter()
+        res = client.get(url)
+        if res.status_code == 200:
+            latencies.append(time.perf_counter() - t)
+        else:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'history.db')
+    t = time.perf_counter()
+    generate(path, args.rows, args.users)
+    print(f"{args.rows} consultas generadas en {time.perf_counter() - t:.1f}s")
+
+    os.environ['DATABASE_URL'] = os.environ['CATALOG_DATABASE_URL'] = 'sqlite:///' + path
+    os.environ.update(CHAT_STORE='memory', GROQ_API_KEY='bench')
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    add_old_routes(server)
+    client = server.app.test_client()
+
+    rnd = random.Random(2)
+    users = [f"U{rnd.randrange(args.users):07d}" for _ in range(args.requests)]
+    days = [(datetime(2025, 1, 1) + timedelta(days=rnd.randrange(365))).strftime('%Y-%m-%d') for _ in range(args.requests)]
+
+    print_row("antes /dates", measure(client, [f"/bench/dates-old?user_id={u}" for u in users]))
+    print_row("antes /query/<date>", measure(client, [f"/bench/query-old/{d}?user_id={u}" for u, d in zip(users, days)]))
+
+    t = time.perf_counter()
+    result = server.app.test_cli_runner().invoke(args=['init-db'])
+    if result.exception:
+        raise result.exception
+    print(f"init-db (indice + resumen de dias) en {time.perf_counter() - t:.1f}s")
+
+    print_row("despues /dates", measure(client, [f"/dates?user_id={u}" for u in users]))
+    print_row("despues /query/<date>", measure(client, [f"/query/{d}?user_id={u}" for u, d in zip(users, days)]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#Benchmark de concurrencia del chat: servidor de desarrollo Flask vs modo ASGI (uvicorn asgi:app)
+#Ambos apuntan al mismo Groq falso, asi la unica diferencia es como se esperan las llamadas a la IA
+#Uso: python bench/load_chat.py --requests 400 --concurrency 1,10,50,200 --latency 0.5
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import httpx
+from common import SERVERS, start_process, stop_process, wait_for_port, summarize, print_row
+
+async def run_load(base_url, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+    #Varios clientes pequeños para que el pool de httpx no sea el cuello de botella del propio benchmark
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=120, limits=httpx.Limits(max_connections=16))
+               for _ in range(-(-concurrency // 16))]
+    try:
+        await clients[0].post("/reset-chat-json")
+        await clients[0].post("/selected-option-chat-json", json={"option": "📚 Información de la Biblioteca"})
+
+        async def worker(client, session_id):
+            nonlocal errors
+            while not queue.empty():
+                i = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    res = await client.post("/send-message-json", json={"message": f"¿Cuál es el horario? #{i}", "option": "📚 Información de la Biblioteca"},
+                                            headers={"X-Session-Id": session_id})
+                    if res.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(clients[i % len(clients)], f"bench-{i}") for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients:
+            await client.aclose()
+    return summarize(latencies, errors, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", default="1,10,50,200")
+    parser.add_argument("--latency", type=float, default=0.5, help="latencia simulada de Groq en segundos")
+    parser.add_argument("--servers", default="flask,asgi")
+    parser.add_argument("--groq-port", type=int, default=8900)
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+
+    fake = start_process(["bench/fake_groq.py", "--port", str(args.groq_port), "--latency", str(args.latency)])
+    chat_file = os.path.join(tempfile.mkdtemp(), "chat.sqlite3")
+    env = {"GROQ_URL": f"http://127.0.0.1:{args.groq_port}/v1/chat/completions", "CHAT_STORE_PATH": chat_file}
+    try:
+        wait_for_port(args.groq_port)
+        for name in args.servers.split(","):
+            proc = start_process(SERVERS[name](args.port), env)
+            try:
+                wait_for_port(args.port)
+                for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                    total = max(args.requests, concurrency)
+                    result = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", total, concurrency))
+                    print_row(f"{name} c={concurrency}", result)
+            finally:
+                stop_process(proc)
+    finally:
+        stop_process(fake)
+
+if __name__ == "__main__":
+    main()
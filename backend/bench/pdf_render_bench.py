@@ -0,0 +1,64 @@
+#Micro-benchmark de /download-pdf: generar el PDF con ReportLab en cada descarga vs leerlo del cache en disco
+#Uso: python bench/pdf_render_bench.py --repeat 50 --words 800
+import argparse
+import os
+import sys
+import tempfile
+import time
+from common import BACKEND_DIR, summarize, print_row
+
+def measure(fn, repeat):
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        if fn():
+            latencies.append(time.perf_counter() - t)
+        else:
+            errors += 1
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--words", type=int, default=800)  #largo maximo del resumen
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ.update(
+        DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+        CATALOG_DATABASE_URL='sqlite:///' + os.path.join(tmp, 'bench.db'),
+        CHAT_STORE='memory',
+        SUMMARY_STORE_PATH=os.path.join(tmp, 'summaries.sqlite3'),
+        PDF_RENDER_DIR=os.path.join(tmp, 'rendered'),
+        GROQ_API_KEY='bench'
+    )
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    from pdf_render import renderSummary
+    import pdf_render
+
+    words = ' '.join(f'palabra{i}' for i in range(args.words))
+    resumen = 'Resumen de prueba\n' + '\n'.join(words[i:i + 600] for i in range(0, len(words), 600))
+    summary_id = server.summary_store.link('bench', 'guest:bench', 'tesis.pdf')
+    server.summary_store.put('bench', resumen)
+    client = server.app.test_client()
+    url = f'/download-pdf?summary_id={summary_id}'
+
+    #Como antes: hoja de estilos y ParagraphStyle nuevos en cada descarga
+    def render_old():
+        pdf_render._summary_style = None
+        return len(renderSummary('tesis.pdf', resumen)) > 0
+    print_row("render + estilos", measure(render_old, args.repeat))
+    print_row("render (estilo en cache)", measure(lambda: len(renderSummary('tesis.pdf', resumen)) > 0, args.repeat))
+
+    first = client.get(url)  #primera descarga: genera y guarda el PDF
+    etag = first.headers['ETag']
+    print_row("GET cache en disco", measure(lambda: client.get(url).status_code == 200, args.repeat))
+    print_row("GET If-None-Match (304)", measure(lambda: client.get(url, headers={'If-None-Match': etag}).status_code == 304, args.repeat))
+    print_row("GET Range 0-1023 (206)", measure(lambda: client.get(url, headers={'Range': 'bytes=0-1023'}).status_code == 206, args.repeat))
+    print(f"PDF de {len(first.data)} bytes, cache: {server.render_cache.stats()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#Benchmark de resiliencia del cliente de Groq contra el Groq falso con fallas inyectadas
+#"inestable": 20% de respuestas 429 y 5% de peticiones lentas; "caido": todas las peticiones responden 503
+#Compara sin reintentos, con reintentos (backoff + jitter), con reintentos + hedge, y el circuit breaker con Groq caido
+#Uso: python bench/resilience.py --requests 300 --concurrency 20
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common import BACKEND_DIR, start_process, stop_process, wait_for_port, summarize, print_row
+
+sys.path.insert(0, BACKEND_DIR)
+from groq_client import CircuitBreaker, GroqClient, GroqError
+
+FLAKY_PORT = 8911
+DOWN_PORT = 8912
+
+def run(client, total, concurrency):
+    latencies = []
+    errors = 0
+    def call(i):
+        start = time.perf_counter()
+        try:
+            client.chat([{"role": "user", "content": f"pregunta {i}"}], name="bench")
+            return time.perf_counter() - start
+        except GroqError:
+            return None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed in pool.map(call, range(total)):
+            if elapsed is None:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+def make_client(port, concurrency, retries, hedge_after=0.0, breaker_failures=0):
+    client = GroqClient("bench", url=f"http://127.0.0.1:{port}/v1/chat/completions", pool_size=concurrency * 2)
+    client.retries = retries
+    client.backoff_base = 0.1
+    client.hedge_after = hedge_after
+    client.breaker = CircuitBreaker(breaker_failures, 5)
+    return client
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    args = parser.parse_args()
+
+    common = ["--latency", str(args.latency), "--tokens", "20", "--tokens-per-second", "0"]
+    flaky = start_process(["bench/fake_groq.py", "--port", str(FLAKY_PORT), "--error-rate", "0.2", "--error-status", "429",
+                           "--slow-rate", "0.05", "--slow-latency", str(args.slow_latency)] + common)
+    down = start_process(["bench/fake_groq.py", "--port", str(DOWN_PORT), "--error-rate", "1", "--error-status", "503"] + common)
+    try:
+        wait_for_port(FLAKY_PORT)
+        wait_for_port(DOWN_PORT)
+        print(f"Groq inestable: 20% 429, 5% lentas ({args.slow_latency}s)")
+        print_row("sin reintentos", run(make_client(FLAKY_PORT, args.concurrency, 0), args.requests, args.concurrency))
+        print_row("reintentos (3)", run(make_client(FLAKY_PORT, args.concurrency, 3), args.requests, args.concurrency))
+        client = make_client(FLAKY_PORT, args.concurrency, 3, hedge_after=args.latency * 3)
+        print_row("reintentos + hedge", run(client, args.requests, args.concurrency))
+        print(f"  {client.health()}")
+        print("Groq caido: todas las peticiones 503")
+        for label, failures in (("reintentos sin breaker", 0), ("reintentos + breaker", 5)):
+            client = make_client(DOWN_PORT, args.concurrency, 3, breaker_failures=failures)
+            start = time.perf_counter()
+            run(client, args.requests, args.concurrency)
+            print(f"{label:<28} {args.requests} errores en {time.perf_counter() - start:.2f}s  {client.health()}")
+    finally:
+        stop_process(flaky)
+        stop_process(down)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#Llena una BD de prueba (SQLite o un PostgreSQL local) para los benchmarks: catalogo recursos_* sintetico,
+#usuarios con contraseña conocida e historial de consultas. Usa DATABASE_URL y CATALOG_DATABASE_URL como el servidor.
+#Las tablas que ya tienen filas no se tocan, asi se puede correr varias veces sobre la misma BD.
+#Uso: DATABASE_URL=sqlite:////tmp/bench.db python bench/seed.py --catalog-rows 20000 --users 200 --history-rows 100000
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+import bcrypt
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, func, select, text
+from common import BACKEND_DIR
+
+BENCH_PASSWORD = 'bench-password'
+
+AUTHORS = ['Gabriel García Márquez', 'Jorge Luis Borges', 'Pedro López', 'Ana Pérez', 'Rómulo Gallegos', 'Teresa de la Parra',
+           'Arturo Uslar Pietri', 'María Fernández', 'José Rodríguez', 'Luisa Martínez', 'Carlos Hernández', 'Elena Díaz']
+SUBJECTS = ['Matemáticas', 'Historia', 'Física', 'Agronomía', 'Literatura', 'Química', 'Biología', 'Computación', 'Geología', 'Estadística']
+WORDS = ['introducción', 'álgebra', 'suelos', 'química', 'venezuela', 'cálculo', 'novela', 'ensayos', 'petróleo', 'economía',
+         'análisis', 'métodos', 'teoría', 'sistemas', 'ecología', 'genética', 'programación', 'redes', 'clima', 'minerales']
+PUBLISHERS = ['Springer', 'Pearson', 'McGraw-Hill', 'Ediciones UCV', 'Monte Ávila', 'Reverté']
+CAREERS = ['Computación', 'Biología', 'Física', 'Química', 'Matemática', 'Geoquímica']
+
+metadata = MetaData()
+#Mismas tablas que el catalogo de la biblioteca, con las columnas que usan el indice y las respuestas
+CATALOG = [
+    Table('recursos_libros', metadata, Column('id', Integer, primary_key=True), Column('titulo', String(255)),
+          Column('autor', String(255)), Column('materia', String(255)), Column('editorial', String(255)),
+          Column('anio', Integer), Column('ubicacion', String(255)), Column('cota', String(64))),
+    Table('recursos_tesis', metadata, Column('id', Integer, primary_key=True), Column('titulo', String(255)),
+          Column('autor', String(255)), Column('tutor', String(255)), Column('carrera', String(255)),
+          Column('anio', Integer), Column('cota', String(64))),
+    Table('recursos_publicaciones_seriadas', metadata, Column('id', Integer, primary_key=True), Column('titulo', String(255)),
+          Column('editorial', String(255)), Column('issn', String(32)), Column('volumen', Integer), Column('numero', Integer),
+          Column('anio', Integer)),
+    Table('recursos_colec_docs', metadata, Column('id', Integer, primary_key=True), Column('titulo', String(255)),
+          Column('autor', String(255)), Column('tema', String(255)), Column('anio', Integer), Column('ubicacion', String(255))),
+]
+
+def title(rnd):
+    return ' '.join(rnd.sample(WORDS, 3)).capitalize()
+
+def catalogRow(table, rnd, i):
+    row = {'titulo': title(rnd), 'anio': rnd.randrange(1960, 2025)}
+    if table == 'recursos_libros':
+        row.update(autor=rnd.choice(AUTHORS), materia=rnd.choice(SUBJECTS), editorial=rnd.choice(PUBLISHERS),
+                   ubicacion=f'Estante {i % 40}', cota=f'QA{i % 1000}.{i}')
+    elif table == 'recursos_tesis':
+        row.update(autor=rnd.choice(AUTHORS), tutor=rnd.choice(AUTHORS), carrera=rnd.choice(CAREERS), cota=f'T{i}')
+    elif table == 'recursos_publicaciones_seriadas':
+        row.update(editorial=rnd.choice(PUBLISHERS), issn=f'{i % 10000:04d}-{i % 9973:04d}', volumen=i % 50, numero=i % 12)
+    else:
+        row.update(autor=rnd.choice(AUTHORS), tema=rnd.choice(SUBJECTS), ubicacion=f'Archivo {i % 20}')
+    return row
+
+def insertBatches(connection, table, rows, batch=5000):
+    for start in range(0, len(rows), batch):
+        connection.execute(table.insert(), rows[start:start + batch])
+
+def isEmpty(connection, table):
+    return connection.execute(select(func.count()).select_from(table)).scalar() == 0
+
+def seedCatalog(engine, rows, rnd):
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text('CREATE EXTENSION IF NOT EXISTS unaccent'))
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for table in CATALOG:
+            count = rows if table.name == 'recursos_libros' else max(1, rows // 4)
+            if not isEmpty(connection, table):
+                print(f'{table.name}: ya tiene filas, no se modifica')
+                continue
+            insertBatches(connection, table, [catalogRow(table.name, rnd, i) for i in range(count)])
+            print(f'{table.name}: {count} filas')
+
+def userId(n):
+    return f'B{n:07d}'
+
+def userEmail(n):
+    return f'bench{n}@ciens.ucv.ve'
+
+def seedUsers(server, users, rounds):
+    table = server.UsuariosBagbot.__table__
+    with server.db.engine.begin() as connection:
+        if not isEmpty(connection, table):
+            print('usuarios_bagbot: ya tiene filas, no se modifica')
+            return
+        pw_hash = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')  #el mismo hash para todos
+        insertBatches(connection, table, [{'id': userId(n), 'nombre': f'Usuario Bench {n}', 'correo': userEmail(n), 'sexo': 'F',
+                                           'cedula': str(10000000 + n), 'contraseña': pw_hash} for n in range(users)])
+    print(f'usuarios_bagbot: {users} usuarios (contraseña "{BENCH_PASSWORD}")')
+
+#Consultas repartidas en los ultimos `days` dias, alternando pregunta del usuario y respuesta de BAGBOT
+def seedHistory(server, rows, users, days, rnd):
+    table = server.Consultas.__table__
+    with server.db.engine.begin() as connection:
+        if not isEmpty(connection, table):
+            print('consultas: ya tiene filas, no se modifica')
+            return
+        start = datetime.now() - timedelta(days=days)
+        batch = []
+        for i in range(rows):
+            n = rnd.randrange(users)
+            batch.append({'usuario_id': userId(n), 'nombre': 'BAGBOT' if i % 2 else f'Usuario Bench {n}',
+                          'descripcion': f'Mensaje de prueba {i} sobre {rnd.choice(WORDS)}', 'tipo': i % 2,
+                          'fecha_creacion': start + timedelta(seconds=rnd.randrange(days * 86400))})
+            if len(batch) == 5000:
+                connection.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(table.insert(), batch)
+    print(f'consultas: {rows} mensajes de {users} usuarios en {days} dias')
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--catalog-rows', type=int, default=20000, help='libros; las otras tablas reciben la cuarta parte')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--history-rows', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.setdefault('CHAT_STORE', 'memory')
+    os.environ.setdefault('GROQ_API_KEY', 'bench')
+    sys.path.insert(0, BACKEND_DIR)
+    import server
+    from password_hashing import BCRYPT_ROUNDS
+    rnd = random.Random(args.seed)
+    start = time.perf_counter()
+    with server.app.app_context():
+        seedCatalog(create_engine(server.CATALOG_DATABASE_URL), args.catalog_rows, rnd)  #el engine del servidor es de solo lectura
+        server.db.create_all()
+        seedUsers(server, args.users, BCRYPT_ROUNDS)
+        seedHistory(server, args.history_rows, args.users, args.days, rnd)
+        result = server.app.test_cli_runner().invoke(args=['init-db'])  #indices y resumen de dias de las consultas
+        if result.exception:
+            raise result.exception
+    print(f'BD lista en {time.perf_counter() - start:.1f}s')
+
+if __name__ == '__main__':
+    main()
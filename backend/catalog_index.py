@@ -0,0 +1,294 @@
+#Indice invertido en memoria del catalogo para responder busquedas simples sin la IA
+#Las busquedas por titulo, autor o tema ("libros del autor Lopez", "tesis sobre suelos") se resuelven aqui
+#en milisegundos; las preguntas complejas siguen por el camino NL->SQL con las dos llamadas a la IA.
+#El indice se construye en un hilo al primer uso. Cuando vence el TTL se actualiza en segundo plano solo con las
+#filas nuevas o modificadas (id mayor al ultimo indexado, o columna de actualizacion mas reciente); las filas
+#eliminadas se reflejan en la reconstruccion completa cada CATALOG_INDEX_FULL_TTL o al invalidar el indice.
+#Cada actualizacion arma un indice nuevo que comparte las listas que no cambiaron, y mientras tanto se sigue
+#usando el anterior. Solo se guardan las columnas de busqueda y las que se muestran en la respuesta.
+import os
+import re
+import time
+import bisect
+import heapq
+import threading
+from sqlalchemy import inspect, text
+from sqlalchemy.sql import sqltypes
+from response_cache import normalize
+from catalog_results import DISPLAY_COLUMNS, formatRecords
+
+#Campos de busqueda y las columnas de cada tabla que les corresponden (por nombre)
+FIELD_COLUMNS = {
+    'title': re.compile(r'titulo'),
+    'author': re.compile(r'autor'),
+    'subject': re.compile(r'tema|materia|descriptor|palabra|clave|asunto'),
+}
+TABLE_LABELS = {
+    'recursos_libros': 'Libro',
+    'recursos_tesis': 'Tesis',
+    'recursos_publicaciones_seriadas': 'Publicación seriada',
+    'recursos_colec_docs': 'Documento',
+}
+#Columna con la fecha de la ultima modificacion de la fila, si la tabla la tiene
+UPDATED_COLUMN = re.compile(os.getenv('CATALOG_INDEX_UPDATED_COLUMN', r'^(updated_at|fecha_actualizacion|fecha_modificacion|actualizado)$'))
+BUILD_BATCH = 2000  #filas leidas por vuelta al construir
+STOPWORDS = {'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'para', 'por', 'un', 'una', 'y', 'e', 'o', 'u'}
+
+#Tipo de recurso pedido -> tablas donde buscar
+KINDS = [
+    (r'libros?', ['recursos_libros']),
+    (r'tesis', ['recursos_tesis']),
+    (r'revistas?|publicaciones seriadas|publicaciones periodicas|publicaciones', ['recursos_publicaciones_seriadas']),
+    (r'documentos?', ['recursos_colec_docs']),
+    (r'recursos?|materiales?|obras?|textos?', None),  #None = todas las tablas
+]
+#Palabra que indica en que campos buscar, en orden; el tema tambien se busca en el titulo y "de" sola puede ser cualquiera
+CUES = [
+    (r'del autor|de la autora|de los autores|de las autoras|del escritor|de la escritora|escrit[oa]s? por|cuy[oa] autora? es|de autor|autor|autora', ('author',)),
+    (r'sobre|acerca de|de tema|del tema|con tema|relacionad[oa]s? con|que traten? de|que traten? sobre|que hablen? de|de la materia|de materia|en el area de', ('subject', 'title')),
+    (r'titulad[oa]s?|llamad[oa]s?|con el titulo|con titulo|cuyo titulo es|que se llamen?|de titulo|del titulo', ('title',)),
+    (r'de', ('author', 'subject', 'title')),
+]
+ANY_FIELD = ('title', 'author', 'subject')
+
+SEARCH_RE = re.compile(
+    r'^(?:(?:me|nos|puedes|podrias|podria|quiero|quisiera|necesito|busca|buscame|buscar|busco|tienen|tienes|hay|muestrame|muestra|ensename|dame|listame|lista|ver|todos|todas|los|las|el|la|un|una|unos|unas|algun|alguno|algunos|alguna|algunas)\s+)*'
+    r'(?P<kind>' + '|'.join(f'(?:{pattern})' for pattern, _ in KINDS) + r')'
+    r'(?:\s+(?P<cue>' + '|'.join(f'(?:{pattern})' for pattern, _ in CUES) + r'))?'
+    r'\s+(?P<terms>.+?)'
+    r'(?:\s+(?:en la biblioteca|por favor|gracias))*$'
+)
+#Si aparecen estas palabras (fechas, conteos, orden, filtros) la pregunta va por el camino de la IA
+COMPLEX_WORDS = {'cuantos', 'cuantas', 'cual', 'cuales', 'antes', 'despues', 'entre', 'desde', 'hasta', 'reciente', 'recientes',
+                 'ultimo', 'ultimos', 'ultima', 'ultimas', 'nuevos', 'antiguos', 'ordenados', 'ordenadas', 'publicados', 'publicadas',
+                 'editorial', 'fecha', 'disponibles', 'prestamo', 'ubicacion', 'donde', 'cuando', 'no', 'excepto', 'menos', 'mas'}
+
+#Retorna (tablas, campos, terminos) de una busqueda simple o None si la pregunta necesita la IA
+def parseSearch(message):
+    query = normalize(message)
+    if not query or len(query) > 200 or re.search(r'\d', query):
+        return None
+    match = SEARCH_RE.match(query)
+    if not match:
+        return None
+    terms = [word for word in match.group('terms').split() if word not in STOPWORDS]
+    if not terms or len(terms) > 8 or COMPLEX_WORDS.intersection(match.group('terms').split()):
+        return None
+    kind = match.group('kind')
+    tables = next(tables for pattern, tables in KINDS if re.fullmatch(pattern, kind))
+    cue = match.group('cue')
+    fields = next(fields for pattern, fields in CUES if re.fullmatch(pattern, cue)) if cue else ANY_FIELD
+    return tables, fields, terms
+
+def contains(docs, doc):
+    i = bisect.bisect_left(docs, doc)
+    return i < len(docs) and docs[i] == doc
+
+class CatalogIndex:
+    def __init__(self, engine, tables, ttl=None, full_ttl=None, limit=15):
+        self.engine = engine  #funcion que retorna el engine del catalogo (se resuelve en el hilo que construye)
+        self.tables = tables
+        self.ttl = ttl if ttl is not None else int(os.getenv('CATALOG_INDEX_TTL', '900'))  #0 = no se actualiza solo
+        #segundos entre reconstrucciones completas (filas eliminadas, tablas sin id ni fecha de modificacion), 0 = nunca
+        self.full_ttl = full_ttl if full_ttl is not None else int(os.getenv('CATALOG_INDEX_FULL_TTL', '86400'))
+        self.limit = limit
+        self._index = None  #dict con documentos, postings, vocabulario, marcas de agua y tiempos de construccion
+        self._building = False
+        self._stale = False
+        self._generation = 0  #cuenta las invalidaciones
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "builds": 0, "incremental_builds": 0, "build_seconds": 0.0, "documents": 0, "replaced": 0}
+
+    #Inicia la construccion en segundo plano si no hay indice o si vencio
+    def _refresh(self):
+        with self._lock:
+            index = self._index
+            expired = index is not None and (self._stale or (self.ttl and time.time() - index['built'] > self.ttl))
+            if self._building or (index is not None and not expired):
+                return
+            self._building = True
+        threading.Thread(target=self._build, daemon=True).start()
+
+    #Construye el indice en segundo plano sin esperar a la primera busqueda (WARMUP=catalog)
+    def warm(self):
+        self._refresh()
+
+    def _build(self):
+        start = time.perf_counter()
+        with self._lock:
+            previous = None if self._stale else self._index  #invalidado: reconstruccion completa
+            generation = self._generation
+        try:
+            index = self.build(previous)
+        except Exception as e:
+            print(f"Error al construir el indice del catalogo: {e}")
+            index = None
+        with self._lock:
+            self._building = False
+            if index is not None:
+                if self._generation == generation:  #si se invalido durante la construccion queda pendiente
+                    self._stale = False
+                self._index = index
+                incremental = previous is not None and index['full'] == previous['full']
+                self._stats["incremental_builds" if incremental else "builds"] += 1
+                self._stats["build_seconds"] = round(time.perf_counter() - start, 3)
+                self._stats["documents"] = len(index['documents']) - len(index['deleted'])
+                self._stats["replaced"] = len(index['deleted'])
+
+    #Columnas de cada tabla: las de busqueda por campo, las que se muestran y la marca de agua para las actualizaciones
+    #(columna de fecha de modificacion o id entero); sin marca la tabla solo cambia en las reconstrucciones completas
+    def _tableInfo(self, inspector):
+        info = {}
+        for table in inspector.get_table_names():
+            if table not in self.tables:
+                continue
+            columns = inspector.get_columns(table)
+            names = [c['name'] for c in columns]
+            fields = {field: [c for c in names if pattern.search(c.lower())] for field, pattern in FIELD_COLUMNS.items()}
+            if not any(fields.values()):
+                continue
+            searched = {c for field_columns in fields.values() for c in field_columns}
+            pk = inspector.get_pk_constraint(table).get('constrained_columns') or []
+            pk = pk[0] if len(pk) == 1 else None
+            updated = next((c for c in names if UPDATED_COLUMN.search(c.lower())), None)
+            integer_pk = pk is not None and any(c['name'] == pk and isinstance(c['type'], sqltypes.Integer) for c in columns)
+            shown = [c for c in names if c != updated and c != pk and (c in searched or DISPLAY_COLUMNS.search(c.lower()))]
+            info[table] = {'pk': pk, 'mark': updated or (pk if integer_pk else None), 'updated': updated is not None,
+                           'fields': fields, 'shown': shown}
+        return info
+
+    #Arma por campo: token -> ids de documento (listas ordenadas), mas el vocabulario ordenado para prefijos.
+    #Con previous agrega solo las filas posteriores a la marca de agua de cada tabla; una fila modificada se agrega
+    #como documento nuevo y la anterior queda en deleted. Las listas que no cambian se comparten con previous.
+    #Con la fecha de modificacion se relee desde la marca (>=) y vuelven las filas de esa misma fecha: si no cambiaron
+    #se saltan, por pk o, en tablas sin pk, por sus valores (edges: filas indexadas con la fecha de la marca).
+    def build(self, previous=None):
+        now = time.time()
+        if previous is not None and self.full_ttl and now - previous['full'] > self.full_ttl:
+            previous = None
+        engine = self.engine()
+        quote = engine.dialect.identifier_preparer.quote
+        if previous is None:
+            tables = self._tableInfo(inspect(engine))
+            documents, postings, keys, deleted, marks, edges = [], {field: {} for field in FIELD_COLUMNS}, {}, set(), {}, {}
+        else:
+            tables = previous['tables']
+            documents = list(previous['documents'])
+            postings = {field: dict(tokens) for field, tokens in previous['postings'].items()}
+            keys, deleted, marks, edges = dict(previous['keys']), set(previous['deleted']), dict(previous['marks']), dict(previous['edges'])
+        copied = set()  #listas ya copiadas en esta construccion (las demas son de previous y no se modifican)
+        new_tokens = set()
+        with engine.connect() as connection:
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text("SET LOCAL statement_timeout = 0"))  #el pool del catalogo limita cada sentencia a pocos segundos
+            for table, info in tables.items():
+                mark = info['mark']
+                if previous is not None and mark is None:
+                    continue
+                selected = [c for c in [info['pk'], mark] if c] + info['shown']
+                sql = f"SELECT {', '.join(quote(c) for c in dict.fromkeys(selected))} FROM {quote(table)}"
+                params = {}
+                if previous is not None and table in marks:
+                    #>= con la fecha de modificacion (puede repetirse); las filas ya indexadas se reemplazan por pk
+                    sql += f" WHERE {quote(mark)} {'>=' if info['updated'] else '>'} :mark"
+                    params['mark'] = marks[table]
+                if mark:
+                    sql += f" ORDER BY {quote(mark)}"
+                result = connection.execution_options(yield_per=BUILD_BATCH).execute(text(sql), params).mappings()
+                last_mark, last_edge = marks.get(table), edges.get(table, frozenset())
+                edge = set(last_edge)
+                for row in result:
+                    shown = {c: row[c] for c in info['shown']}
+                    key = (table, row[info['pk']]) if info['pk'] else None
+                    if mark and row[mark] is not None and row[mark] != marks.get(table):
+                        marks[table] = row[mark]
+                        edge = set()
+                    if key is not None and key in keys:
+                        if documents[keys[key]][1] == shown:
+                            continue  #misma fila sin cambios, releida por el >= de la marca
+                        deleted.add(keys[key])
+                    elif key is None and last_mark is not None and row[mark] == last_mark and tuple(shown.values()) in last_edge:
+                        continue
+                    if key is None and mark and row[mark] is not None:
+                        edge.add(tuple(shown.values()))
+                    doc = len(documents)
+                    documents.append((table, shown))
+                    if key is not None:
+                        keys[key] = doc
+                    for field, field_columns in info['fields'].items():
+                        for column in field_columns:
+                            for token in normalize(str(row[column] or '')).split():
+                                if token in STOPWORDS:
+                                    continue
+                                docs = postings[field].get(token)
+                                if docs is None:
+                                    docs = postings[field][token] = []
+                                    copied.add((field, token))
+                                    new_tokens.add(field)
+                                elif (field, token) not in copied:
+                                    docs = postings[field][token] = list(docs)
+                                    copied.add((field, token))
+                                if not docs or docs[-1] != doc:  #listas ordenadas y sin repetidos
+                                    docs.append(doc)
+                if not info['pk'] and mark:
+                    edges[table] = frozenset(edge)
+        if previous is None:
+            vocabulary = {field: sorted(tokens) for field, tokens in postings.items()}
+        else:
+            vocabulary = {field: sorted(postings[field]) if field in new_tokens else previous['vocabulary'][field] for field in postings}
+        return {'documents': documents, 'postings': postings, 'vocabulary': vocabulary, 'keys': keys, 'deleted': frozenset(deleted),
+                'marks': marks, 'edges': edges, 'tables': tables, 'built': now, 'full': previous['full'] if previous else now}
+
+    #Listas de documentos que contienen el termino en el campo, como palabra completa o como prefijo (parecido al LIKE '%x%')
+    def _matches(self, postings, vocabulary, term):
+        if len(term) < 3:
+            return [postings[term]] if term in postings else []
+        i = bisect.bisect_left(vocabulary, term)
+        j = bisect.bisect_left(vocabulary, term + '\uffff')
+        return [postings[token] for token in vocabulary[i:j]]
+
+    #Busca los terminos en los campos en orden de prioridad; retorna [(tabla, fila)] o None si el indice aun no esta listo
+    def search(self, tables, fields, terms):
+        self._refresh()
+        index = self._index
+        if index is None:
+            return None
+        documents, postings, vocabulary, deleted = index['documents'], index['postings'], index['vocabulary'], index['deleted']
+        results, seen = [], set()
+        for field in fields:
+            lists = sorted((self._matches(postings[field], vocabulary[field], term) for term in terms), key=lambda l: sum(map(len, l)))
+            if not lists or not all(lists):
+                continue
+            #Se recorren en orden los documentos del termino menos frecuente y se verifica que tengan los demas,
+            #asi se detiene al llegar al limite sin intersectar listas completas
+            last = None
+            for doc in heapq.merge(*lists[0]):
+                if doc == last or doc in seen or doc in deleted:
+                    continue
+                last = doc
+                if tables is not None and documents[doc][0] not in tables:
+                    continue
+                if all(any(contains(docs, doc) for docs in other) for other in lists[1:]):
+                    seen.add(doc)
+                    results.append(documents[doc])
+                    if len(results) >= self.limit:
+                        return results
+        return results
+
+    #Respuesta ya formateada para una busqueda simple, o None para seguir por el camino de la IA
+    def answer(self, message):
+        parsed = parseSearch(message)
+        records = self.search(*parsed) if parsed else None
+        with self._lock:
+            self._stats["hits" if records else "misses"] += 1
+        return formatRecords([(TABLE_LABELS.get(table, table), row) for table, row in records]) if records else None
+
+    #Descarta el indice para que se reconstruya con el proximo uso (despues de modificar el catalogo)
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, ready=self._index is not None)
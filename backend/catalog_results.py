@@ -0,0 +1,46 @@
+#Presentacion de las filas del catalogo: solo las columnas que le sirven al usuario, textos largos recortados
+#y un registro JSON por linea para el prompt de build_answer, en lugar del repr de filas completas.
+#Si el resultado es una lista simple de registros se puede responder con una plantilla, sin la IA.
+import os
+import re
+import json
+
+#Columnas que se muestran (por nombre); si una fila no tiene ninguna (por ejemplo un COUNT) se muestran todas
+DISPLAY_COLUMNS = re.compile(os.getenv('CATALOG_DISPLAY_COLUMNS', r'titulo|autor|tema|materia|editorial|edicion|anio|^ano|fecha|ubicacion|cota|isbn|issn|tutor|carrera|volumen|numero'))
+RESULT_MAX_CHARS = int(os.getenv('RESULT_MAX_CHARS', '200'))  #largo maximo de cada valor
+TEMPLATE_ANSWERS = os.getenv('SQL_TEMPLATE_ANSWERS', '1') == '1'  #listas de registros sin llamar a build_answer
+
+def truncate(value):
+    if isinstance(value, str) and len(value) > RESULT_MAX_CHARS:
+        return value[:RESULT_MAX_CHARS].rstrip() + '…'
+    return value
+
+def isDisplayRow(row):
+    return any(DISPLAY_COLUMNS.search(column.lower()) for column in row)
+
+#Fila reducida a las columnas visibles, sin ids ni valores vacios
+def project(row):
+    display = isDisplayRow(row)
+    return {column: truncate(value) for column, value in row.items()
+            if value not in (None, '') and column != 'id' and not column.endswith('_id')
+            and (not display or DISPLAY_COLUMNS.search(column.lower()))}
+
+#Un objeto JSON por linea, para el prompt de build_answer
+def compactRows(rows):
+    if not rows:
+        return '[]'
+    return '\n'.join(json.dumps(project(row), ensure_ascii=False, default=str) for row in rows)
+
+#Texto de la respuesta con un registro por linea, en el mismo formato que pide answerMessages; records es [(etiqueta, fila)]
+def formatRecords(records):
+    lines = []
+    for label, row in records:
+        values = ", ".join(f"{column.replace('_', ' ').capitalize()}: {value}" for column, value in project(row).items())
+        lines.append(f"{label}. {values}" if label else values)
+    return f"Encontré {len(records)} registro(s) en la biblioteca:<br>" + "<br>".join(lines)
+
+#Respuesta sin IA cuando el SQL devolvio una lista de registros; None si no hay filas o son conteos/agregados
+def templateAnswer(rows):
+    if not TEMPLATE_ANSWERS or not rows or not all(isDisplayRow(row) for row in rows):
+        return None
+    return formatRecords([(None, row) for row in rows])
@@ -0,0 +1,156 @@
+#Almacenamiento de las conversaciones de invitados por sesion (reemplaza el chat.json global)
+#Los mensajes se agregan sin reescribir la conversacion y cada lectura solo toca la sesion pedida.
+#Tambien guarda la opcion de chat seleccionada por cada invitado o usuario (antes la variable global userOption)
+#Backends: "sqlite" (archivo local, compartido entre workers del mismo nodo) o "memory" (LRU en el proceso)
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_SESSION = 'default'  #sesion usada por clientes que no envian X-Session-Id
+
+#Conversaciones en memoria con expiracion por inactividad y limite de sesiones (LRU)
+class MemoryChatStore:
+    def __init__(self, ttl=86400, max_sessions=1000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  #session_id -> {'messages': [...], 'updated': ts}
+        self._options = OrderedDict()  #clave -> (opcion, ts)
+        self._lock = threading.Lock()
+
+    def _session(self, session_id, create=False):
+        session = self._sessions.get(session_id)
+        if session and self.ttl and time.time() - session['updated'] > self.ttl:
+            del self._sessions[session_id]
+            session = None
+        if session is None and create:
+            session = self._sessions[session_id] = {'messages': [], 'updated': time.time()}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)  #se descarta la sesion usada hace mas tiempo
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def append(self, session_id, messages):
+        with self._lock:
+            session = self._session(session_id, create=True)
+            session['messages'].extend(messages)
+            session['updated'] = time.time()
+
+    #Mensajes de la sesion a partir de la posicion after (los que el cliente aun no tiene), hasta limit
+    def get(self, session_id, after=0, limit=None):
+        with self._lock:
+            session = self._session(session_id)
+            messages = session['messages'] if session else []
+            return messages[after:after + limit] if limit else messages[after:]
+
+    def count(self, session_id):
+        with self._lock:
+            session = self._session(session_id)
+            return len(session['messages']) if session else 0
+
+    def reset(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def set_option(self, key, option):
+        with self._lock:
+            self._options[key] = (option, time.time())
+            self._options.move_to_end(key)
+            while len(self._options) > self.max_sessions:
+                self._options.popitem(last=False)
+
+    def get_option(self, key):
+        with self._lock:
+            option, updated = self._options.get(key, (None, 0))
+            if self.ttl and time.time() - updated > self.ttl:
+                return None
+            return option
+
+#Conversaciones en un archivo SQLite, un registro por mensaje indexado por sesion
+class SQLiteChatStore:
+    SWEEP_EVERY = 600  #segundos entre limpiezas de sesiones expiradas
+
+    def __init__(self, path, ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()  #una conexion por hilo
+        self._last_sweep = 0
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_sessions (session_id TEXT PRIMARY KEY, updated REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, type INTEGER NOT NULL, message TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_messages_session ON chat_messages (session_id, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_options (key TEXT PRIMARY KEY, option TEXT, updated REAL NOT NULL)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def _expired(self, conn, session_id):
+        row = conn.execute("SELECT updated FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is None or (self.ttl and time.time() - row[0] > self.ttl)
+
+    def append(self, session_id, messages):
+        now = time.time()
+        with self._conn() as conn:
+            if self._expired(conn, session_id):
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.execute("INSERT OR REPLACE INTO chat_sessions (session_id, updated) VALUES (?, ?)", (session_id, now))
+            conn.executemany("INSERT INTO chat_messages (session_id, type, message) VALUES (?, ?, ?)",
+                             [(session_id, m['type'], m['message']) for m in messages])
+        if now - self._last_sweep > self.SWEEP_EVERY:
+            self._last_sweep = now
+            self.sweep()
+
+    def get(self, session_id, after=0, limit=None):
+        conn = self._conn()
+        if self._expired(conn, session_id):
+            return []
+        rows = conn.execute("SELECT type, message FROM chat_messages WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?",
+                            (session_id, limit or -1, after)).fetchall()
+        return [{'type': row[0], 'message': row[1]} for row in rows]
+
+    def count(self, session_id):
+        conn = self._conn()
+        if self._expired(conn, session_id):
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def reset(self, session_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def set_option(self, key, option):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO chat_options (key, option, updated) VALUES (?, ?, ?)", (key, option, time.time()))
+
+    def get_option(self, key):
+        row = self._conn().execute("SELECT option, updated FROM chat_options WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return None
+        return row[0]
+
+    #Elimina las sesiones y opciones que superaron el TTL
+    def sweep(self):
+        if not self.ttl:
+            return
+        limit = time.time() - self.ttl
+        with self._conn() as conn:
+            conn.execute("DELETE FROM chat_messages WHERE session_id IN (SELECT session_id FROM chat_sessions WHERE updated < ?)", (limit,))
+            conn.execute("DELETE FROM chat_sessions WHERE updated < ?", (limit,))
+            conn.execute("DELETE FROM chat_options WHERE updated < ?", (limit,))
+
+#Crea el almacenamiento configurado con CHAT_STORE, CHAT_STORE_PATH, CHAT_TTL_SECONDS y CHAT_MAX_SESSIONS
+def create_store():
+    backend = os.getenv('CHAT_STORE', 'sqlite')
+    ttl = int(os.getenv('CHAT_TTL_SECONDS', '86400'))
+    if backend == 'memory':
+        return MemoryChatStore(ttl=ttl, max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', '1000')))
+    if backend == 'sqlite':
+        return SQLiteChatStore(os.getenv('CHAT_STORE_PATH', 'chat.sqlite3'), ttl=ttl)
+    raise ValueError(f"CHAT_STORE desconocido: {backend}")
@@ -0,0 +1,143 @@
+#Guardado de los mensajes del chat en la tabla consultas, un turno completo por transaccion
+#Un turno (pregunta del usuario y respuesta de BAGBOT, o solo el mensaje de BAGBOT) se guarda despues de la
+#respuesta de la IA con un solo INSERT de varias filas, y su dia en consultas_dias en la misma transaccion:
+#la BD no se toca mientras se espera a Groq y hay un commit por turno en lugar de uno por mensaje.
+#Con CONSULTAS_BATCH=1 los turnos de todas las peticiones del proceso se juntan en un hilo y se escriben en lotes
+#(un commit por lote). Quien guarda espera a que su lote se confirme, asi el front recibe los ids del cursor y el
+#historial que pide justo despues ya incluye lo guardado. Los lotes se escriben al llenarse, cada CONSULTAS_BATCH_MS
+#y al cerrar el proceso.
+import os
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import Future
+
+CONSULTAS_BATCH = os.getenv('CONSULTAS_BATCH', '0') == '1'
+CONSULTAS_BATCH_MS = float(os.getenv('CONSULTAS_BATCH_MS', '20'))  #espera maxima de un turno antes de escribir su lote
+CONSULTAS_BATCH_ROWS = int(os.getenv('CONSULTAS_BATCH_ROWS', '200'))  #filas por lote, al llegar a este numero se escribe ya
+CONSULTAS_BATCH_QUEUE = int(os.getenv('CONSULTAS_BATCH_QUEUE', '5000'))  #filas en espera; si se llena se escribe directo
+
+#Fila de la tabla consultas; la fecha se pone aqui (no en la BD) para que la pregunta conserve la hora en que llego
+def row(userId, name, message, tipo, date=None):
+    return {'usuario_id': userId, 'nombre': name, 'descripcion': message, 'tipo': tipo, 'fecha_creacion': date or datetime.now()}
+
+#INSERT de varias filas que retorna los ids en el orden de las filas
+def insertStatement(table):
+    return table.insert().returning(table.c.id, sort_by_parameter_order=True)
+
+#(usuario, dia) distintos de las filas, para consultas_dias
+def days(rows):
+    return sorted({(r['usuario_id'], r['fecha_creacion'].date()) for r in rows})
+
+#Mensajes guardados con el formato de consultaDict
+def messages(rows, ids):
+    return [{"id": consultaId, "name": r['nombre'], "type": r['tipo'], "message": r['descripcion'], "date": r['fecha_creacion'].isoformat()}
+            for r, consultaId in zip(rows, ids)]
+
+class ConsultasWriter:
+    #daysStatement(dialecto, [(usuario, dia)]) es la sentencia que registra los dias en consultas_dias
+    def __init__(self, engine, table, daysStatement, batch=None, batch_ms=None, batch_rows=None, max_queued=None):
+        self.engine = engine
+        self.table = table
+        self.daysStatement = daysStatement
+        self.batch = CONSULTAS_BATCH if batch is None else batch
+        self.batch_ms = batch_ms or CONSULTAS_BATCH_MS
+        self.batch_rows = batch_rows or CONSULTAS_BATCH_ROWS
+        self.max_queued = max_queued or CONSULTAS_BATCH_QUEUE
+        self._cond = threading.Condition()
+        self._pending = []  #(filas del turno, future)
+        self._rows = 0  #filas en espera
+        self._first = 0.0  #momento en que llego el turno mas antiguo en espera
+        self._thread = None
+        self._closed = False
+        self._transactions = 0
+        self._saved = 0
+        self._direct = 0  #turnos escritos sin lote (cola llena o cerrada)
+
+    #Escribe los turnos en una transaccion y retorna los mensajes guardados de cada turno
+    def _write(self, turns):
+        rows = [r for turn in turns for r in turn]
+        with self.engine.begin() as connection:
+            ids = connection.execute(insertStatement(self.table), rows).scalars().all()
+            connection.execute(self.daysStatement(connection.dialect.name, days(rows)))
+        saved, start = [], 0
+        for turn in turns:
+            saved.append(messages(turn, ids[start:start + len(turn)]))
+            start += len(turn)
+        with self._cond:
+            self._transactions += 1
+            self._saved += len(rows)
+        return saved
+
+    #Guarda un turno (lista de filas de row()) y retorna sus mensajes con id
+    def save(self, rows):
+        if not rows:
+            return []
+        if self.batch:
+            future = self._enqueue(rows)
+            if future is not None:
+                return future.result()
+        with self._cond:
+            self._direct += 1
+        return self._write([rows])[0]
+
+    def _enqueue(self, rows):
+        with self._cond:
+            if self._closed or self._rows + len(rows) > self.max_queued:
+                return None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='consultas-writer', daemon=True)
+                self._thread.start()
+            first = not self._pending
+            if first:
+                self._first = time.monotonic()
+            future = Future()
+            self._pending.append((rows, future))
+            self._rows += len(rows)
+            if first or self._rows >= self.batch_rows:  #el hilo espera un primer turno o que se llene el lote
+                self._cond.notify()
+            return future
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                #Espera a que se llene el lote o a que el turno mas antiguo cumpla CONSULTAS_BATCH_MS
+                while self._rows < self.batch_rows and not self._closed:
+                    remaining = self._first + self.batch_ms / 1000 - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending, self._rows = self._pending, [], 0
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            saved = self._write([rows for rows, _ in batch])
+        except Exception:
+            #Un turno con datos invalidos no debe hacer fallar a los demas: se reintenta cada uno por separado
+            for rows, future in batch:
+                try:
+                    future.set_result(self._write([rows])[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+        for (_, future), turn in zip(batch, saved):
+            future.set_result(turn)
+
+    #Escribe lo que queda en espera y detiene el hilo; los turnos que lleguen despues se escriben directo
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {"batch": self.batch, "pending_rows": self._rows, "transactions": self._transactions, "rows": self._saved,
+                    "direct": self._direct, "rows_per_transaction": round(self._saved / self._transactions, 1) if self._transactions else 0}
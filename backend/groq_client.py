@@ -0,0 +1,435 @@
+#Cliente compartido para todas las llamadas a Groq (chat, PDF, NL->SQL y respuesta final)
+#Mantiene una sesion HTTP con pool de conexiones keep-alive y timeouts de conexion/lectura.
+#Resiliencia: reintentos con backoff exponencial y jitter (respetando Retry-After), peticion duplicada (hedge)
+#opcional cuando la primera tarda, y un circuit breaker que corta las llamadas mientras Groq falla.
+import os
+import json
+import time
+import random
+import asyncio
+import itertools
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"  #Groq url
+GROQ_MODEL = "llama-3.1-8b-instant"  #usaremos el modelo llama-3
+ASYNC_SHARD_SIZE = 16  #conexiones por cliente httpx en el modo asyncio
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class GroqError(Exception):  #Error al llamar a Groq (red, timeout o respuesta sin choices)
+    def __init__(self, message, status=None, retry_after=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after  #segundos pedidos por Groq en Retry-After
+        self.retryable = retryable or status in RETRYABLE_STATUS
+
+class GroqUnavailable(GroqError):  #El circuito esta abierto: no se llama a Groq hasta que pase el tiempo de espera
+    pass
+
+#Segundos del encabezado Retry-After (numero o fecha HTTP)
+def retryAfter(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def statusError(status, body, headers):
+    return GroqError(body, status=status, retry_after=retryAfter(headers.get("retry-after")))
+
+#Circuit breaker: despues de max_failures fallos seguidos se abre por reset_timeout segundos;
+#luego deja pasar una sola llamada de prueba y se cierra si funciona
+class CircuitBreaker:
+    def __init__(self, max_failures, reset_timeout):
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self._opened >= self.reset_timeout else "open"
+
+    def allow(self):
+        if not self.max_failures:
+            return True
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.max_failures and (self._probing or self._failures >= self.max_failures):
+                self._opened = time.monotonic()
+            self._probing = False
+
+    def failures(self):
+        with self._lock:
+            return self._failures
+
+class GroqClient:
+    def __init__(self, api_key, url=None, model=None, pool_size=None, connect_timeout=None, read_timeout=None):
+        self.url = url or os.getenv("GROQ_URL", GROQ_URL)
+        self.model = model or os.getenv("GROQ_MODEL", GROQ_MODEL)
+        pool_size = self._pool_size = pool_size or int(os.getenv("GROQ_POOL_SIZE", "10"))
+        self.timeout = (
+            connect_timeout or float(os.getenv("GROQ_CONNECT_TIMEOUT", "5")),  #segundos para abrir la conexion
+            read_timeout or float(os.getenv("GROQ_READ_TIMEOUT", "60"))  #segundos maximos esperando respuesta
+        )
+        self.hedge_after = float(os.getenv("GROQ_HEDGE_AFTER", "0"))  #segundos antes de duplicar una llamada sin stream, 0 = desactivado
+        #Una sola sesion reutiliza las conexiones TCP+TLS entre peticiones; con hedge cada llamada puede usar dos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size * 2 if self.hedge_after else pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        self._api_key = api_key
+        self._async_pool_size = int(os.getenv("GROQ_ASYNC_POOL_SIZE", "200"))
+        self._async_clients = []  #clientes httpx para el modo asyncio, se crean al primer uso
+        self._async_cycle = None
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.retries = int(os.getenv("GROQ_RETRIES", "2"))  #reintentos despues del primer intento
+        self.backoff_base = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+        self.retry_after_max = float(os.getenv("GROQ_RETRY_AFTER_MAX", "10"))  #si Groq pide esperar mas, se falla de inmediato
+        self.breaker = CircuitBreaker(int(os.getenv("GROQ_BREAKER_FAILURES", "5")), float(os.getenv("GROQ_BREAKER_RESET", "30")))
+        self._hedge_pool = None
+        self._resilience = {"retries": 0, "hedges": 0, "hedge_wins": 0, "short_circuits": 0}
+
+    #False mientras el circuito esta abierto, para responder en modo degradado sin intentar la llamada
+    def available(self):
+        return self.breaker.state() != "open"
+
+    def _count(self, key):
+        with self._lock:
+            self._resilience[key] += 1
+
+    #Espera antes del siguiente intento, o None si no se debe reintentar
+    def _backoff(self, attempt, error):
+        if not error.retryable or attempt >= self.retries:
+            return None
+        if error.retry_after is not None:
+            return error.retry_after if error.retry_after <= self.retry_after_max else None
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))  #full jitter
+
+    def _allow(self):
+        if not self.breaker.allow():
+            self._count("short_circuits")
+            raise GroqUnavailable("Groq no disponible temporalmente (circuito abierto)", retryable=False)
+
+    #Resultado del breaker segun el error: los errores de la peticion (400, 401) no significan que Groq este caido
+    def _settle(self, error):
+        if error is None or not error.retryable:
+            self.breaker.success()
+        else:
+            self.breaker.failure()
+
+    #Ejecuta attempt() con reintentos y circuit breaker
+    def _call(self, attempt):
+        for n in itertools.count():
+            self._allow()
+            try:
+                result = attempt()
+            except GroqError as e:
+                self._settle(e)
+                delay = self._backoff(n, e)
+                if delay is None:
+                    raise
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.failure()
+                raise
+            self._settle(None)
+            return result
+
+    async def _acall(self, attempt):
+        for n in itertools.count():
+            self._allow()
+            try:
+                result = await attempt()
+            except GroqError as e:
+                self._settle(e)
+                delay = self._backoff(n, e)
+                if delay is None:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.failure()
+                raise
+            self._settle(None)
+            return result
+
+    #Si la llamada no termina en hedge_after segundos se envia una copia y se usa la primera respuesta correcta.
+    #La llamada perdedora sigue hasta terminar (no se puede cancelar una peticion de requests ya enviada).
+    #Cada llamada con hedge ocupa dos hilos (la original y la copia): el pool tiene el doble de hilos que llamadas
+    #simultaneas, si no las llamadas se esperarian entre ellas con la mitad de la concurrencia
+    def _hedged(self, fn):
+        if not self.hedge_after:
+            return fn()
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self._pool_size * 2, thread_name_prefix="groq-hedge")
+        first = self._hedge_pool.submit(fn)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        self._count("hedges")
+        pending = {first, self._hedge_pool.submit(fn)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _ahedged(self, fn):
+        if not self.hedge_after:
+            return await fn()
+        first = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        self._count("hedges")
+        pending = {first, asyncio.ensure_future(fn())}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if task is not first:
+                        self._count("hedge_wins")
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    #Envia los mensajes a Groq y retorna el texto de la respuesta
+    def chat(self, messages, name="chat", **options):
+        payload = {"model": self.model, "messages": messages, **options}
+        return self._call(lambda: self._hedged(lambda: self._post(payload, name)))
+
+    #Un intento de chat
+    def _post(self, payload, name):
+        start = time.perf_counter()
+        ok = False
+        try:
+            res = self.session.post(self.url, json=payload, timeout=self.timeout)
+            if res.status_code != 200:
+                raise statusError(res.status_code, res.text, res.headers)
+            res_json = res.json()
+            if "choices" not in res_json:
+                raise GroqError(str(res_json))
+            ok = True
+            metrics.tokens(name, res_json.get("usage"))
+            return res_json["choices"][0]["message"]["content"]
+        except requests.RequestException as e:
+            raise GroqError(str(e), retryable=True) from e
+        finally:
+            self._record(name, time.perf_counter() - start, ok)
+
+    #Abre la respuesta con stream; los reintentos solo ocurren aqui, antes de enviar el primer token al usuario
+    def _open_stream(self, payload, name):
+        start = time.perf_counter()
+        try:
+            res = self.session.post(self.url, json=payload, timeout=self.timeout, stream=True)
+        except requests.RequestException as e:
+            self._record(name, time.perf_counter() - start, False)
+            raise GroqError(str(e), retryable=True) from e
+        if res.status_code != 200:
+            error = statusError(res.status_code, res.text, res.headers)
+            res.close()
+            self._record(name, time.perf_counter() - start, False)
+            raise error
+        return res
+
+    #Igual que chat pero con stream=true: genera los tokens a medida que Groq los envia
+    def stream(self, messages, name="chat", **options):
+        payload = {"model": self.model, "messages": messages, "stream": True, **options}
+        start = time.perf_counter()
+        res = self._call(lambda: self._open_stream(payload, name))
+        first_token = True
+        ok = False
+        try:
+            with res:
+                for line in res.iter_lines():
+                    line = line.decode("utf-8")
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = self._delta(json.loads(data), name)
+                    if delta:
+                        if first_token:  #tiempo hasta el primer token, la latencia que percibe el usuario
+                            self._record(name + "_first_token", time.perf_counter() - start, True)
+                            first_token = False
+                        yield delta
+            ok = True
+        except requests.RequestException as e:
+            raise GroqError(str(e)) from e
+        finally:
+            self._record(name, time.perf_counter() - start, ok)
+
+    #Clientes asincronos compartidos, permiten cientos de llamadas en vuelo en un solo proceso.
+    #El pool de httpcore recorre todas sus conexiones en cada peticion (costo cuadratico con cientos en vuelo),
+    #por eso el pool total se reparte en varios clientes pequeños que se usan en round-robin
+    def _aclient(self):
+        if not self._async_clients:
+            connect, read = self.timeout
+            shard = ASYNC_SHARD_SIZE
+            for _ in range(max(1, -(-self._async_pool_size // shard))):
+                self._async_clients.append(httpx.AsyncClient(
+                    headers={"Authorization": f"Bearer {self._api_key}", "Content-Type": "application/json"},
+                    timeout=httpx.Timeout(read, connect=connect),
+                    limits=httpx.Limits(max_connections=shard, max_keepalive_connections=shard)
+                ))
+            self._async_cycle = itertools.cycle(self._async_clients)
+        return next(self._async_cycle)
+
+    #Version asyncio de chat
+    async def achat(self, messages, name="chat", **options):
+        payload = {"model": self.model, "messages": messages, **options}
+        return await self._acall(lambda: self._ahedged(lambda: self._apost(payload, name)))
+
+    async def _apost(self, payload, name):
+        start = time.perf_counter()
+        ok = False
+        try:
+            res = await self._aclient().post(self.url, json=payload)
+            if res.status_code != 200:
+                raise statusError(res.status_code, res.text, res.headers)
+            res_json = res.json()
+            if "choices" not in res_json:
+                raise GroqError(str(res_json))
+            ok = True
+            metrics.tokens(name, res_json.get("usage"))
+            return res_json["choices"][0]["message"]["content"]
+        except httpx.HTTPError as e:
+            raise GroqError(str(e), retryable=True) from e
+        finally:
+            self._record(name, time.perf_counter() - start, ok)
+
+    async def _aopen_stream(self, payload, name):
+        start = time.perf_counter()
+        client = self._aclient()
+        try:
+            res = await client.send(client.build_request("POST", self.url, json=payload), stream=True)
+        except httpx.HTTPError as e:
+            self._record(name, time.perf_counter() - start, False)
+            raise GroqError(str(e), retryable=True) from e
+        if res.status_code != 200:
+            error = statusError(res.status_code, (await res.aread()).decode("utf-8", "replace"), res.headers)
+            await res.aclose()
+            self._record(name, time.perf_counter() - start, False)
+            raise error
+        return res
+
+    #Version asyncio de stream
+    async def astream(self, messages, name="chat", **options):
+        payload = {"model": self.model, "messages": messages, "stream": True, **options}
+        start = time.perf_counter()
+        res = await self._acall(lambda: self._aopen_stream(payload, name))
+        first_token = True
+        ok = False
+        try:
+            async for line in res.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = self._delta(json.loads(data), name)
+                if delta:
+                    if first_token:
+                        self._record(name + "_first_token", time.perf_counter() - start, True)
+                        first_token = False
+                    yield delta
+            ok = True
+        except httpx.HTTPError as e:
+            raise GroqError(str(e)) from e
+        finally:
+            await res.aclose()
+            self._record(name, time.perf_counter() - start, ok)
+
+    async def aclose(self):
+        for client in self._async_clients:
+            await client.aclose()
+        self._async_clients = []
+
+    #Texto de un evento del stream; el ultimo evento de Groq trae los tokens usados en x_groq.usage y puede no tener choices
+    def _delta(self, chunk, name):
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        if usage:
+            metrics.tokens(name, usage)
+        choices = chunk.get("choices")
+        return choices[0].get("delta", {}).get("content") if choices else None
+
+    #Guarda los contadores de latencia por tipo de llamada, tambien como etapa llm_<nombre> en /metrics
+    def _record(self, name, elapsed, ok):
+        metrics.stage("llm_" + name, elapsed)
+        if not ok:
+            metrics.count("bagbot_llm_errors_total", call=name)
+        with self._lock:
+            stat = self._stats.setdefault(name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+            ms = elapsed * 1000
+            stat["calls"] += 1
+            stat["errors"] += 0 if ok else 1
+            stat["total_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+            stat["last_ms"] = ms
+
+    #Estado del circuit breaker y contadores de reintentos, hedges y llamadas cortadas
+    def health(self):
+        with self._lock:
+            counters = dict(self._resilience)
+        return dict(counters, breaker=self.breaker.state(), consecutive_failures=self.breaker.failures())
+
+    #Retorna una copia de los contadores con el promedio calculado
+    def stats(self):
+        with self._lock:
+            result = {}
+            for name, stat in self._stats.items():
+                result[name] = dict(stat, avg_ms=stat["total_ms"] / stat["calls"] if stat["calls"] else 0.0)
+            return result
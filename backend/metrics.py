@@ -0,0 +1,123 @@
+#Metricas de latencia por etapa: peticion, esquema, llamadas a Groq, SQL, extraccion de PDF y guardado
+#Cada etapa se mide con span("etapa") y se acumula en histogramas de buckets fijos que se exportan en /metrics
+#con el formato de texto de Prometheus. Con TIMING_LOG=1 cada peticion escribe una linea JSON con sus etapas.
+#Los valores son de cada proceso (igual que /stats): con varios workers Prometheus debe leer cada uno.
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TIMING_LOG = os.getenv('TIMING_LOG', '0') == '1'  #una linea JSON por peticion con el tiempo de cada etapa
+#Limites superiores de los buckets en segundos
+BUCKETS = tuple(float(b) for b in os.getenv('METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30').split(','))
+
+HELP = {
+    'bagbot_request_seconds': ('histogram', 'Tiempo de respuesta de cada peticion HTTP (en stream, hasta enviar los encabezados)'),
+    'bagbot_stage_seconds': ('histogram', 'Tiempo de cada etapa del pipeline (llm_<llamada>, sql, schema, pdf_extract, db_save...)'),
+    'bagbot_llm_errors_total': ('counter', 'Llamadas a Groq que fallaron, por tipo de llamada'),
+    'bagbot_llm_tokens_total': ('counter', 'Tokens reportados por Groq, por tipo de llamada (prompt o completion)'),
+}
+
+_lock = threading.Lock()
+_histograms = {}  #(nombre, etiquetas) -> [conteo por bucket (+Inf al final), suma, total]
+_counters = {}  #(nombre, etiquetas) -> valor
+#Tiempos de la peticion en curso; los hilos de anyio copian el contexto, asi run_sync tambien registra aqui
+_request = contextvars.ContextVar('bagbot_request', default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+def count(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+#Registra el tiempo de una etapa en su histograma y en el log de la peticion en curso
+def stage(name, seconds):
+    observe('bagbot_stage_seconds', seconds, stage=name)
+    timing = _request.get()
+    if timing is not None:
+        timing['stages'][name] = timing['stages'].get(name, 0.0) + seconds
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage(name, time.perf_counter() - start)
+
+#Tokens de la respuesta de Groq (campo usage)
+def tokens(call, usage):
+    if not usage:
+        return
+    for kind in ('prompt', 'completion'):
+        if usage.get(kind + '_tokens'):
+            count('bagbot_llm_tokens_total', usage[kind + '_tokens'], call=call, type=kind)
+
+#Inicio y fin de una peticion; route es la regla de la ruta ("/query/<date>"), no la URL, para no crear una serie por valor
+def startRequest(method, route):
+    return _request.set({'method': method, 'route': route, 'start': time.perf_counter(), 'stages': {}})
+
+def endRequest(token, status):
+    timing = _request.get()
+    _request.reset(token)
+    if timing is None:
+        return
+    elapsed = time.perf_counter() - timing['start']
+    observe('bagbot_request_seconds', elapsed, method=timing['method'], route=timing['route'], status=status)
+    if TIMING_LOG:
+        print(json.dumps({
+            "ts": round(time.time(), 3),
+            "method": timing['method'],
+            "route": timing['route'],
+            "status": status,
+            "ms": round(elapsed * 1000, 1),
+            "stages": {name: round(seconds * 1000, 1) for name, seconds in timing['stages'].items()}
+        }), flush=True)
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escape = lambda v: v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs) + '}'
+
+#Texto en el formato de exposicion de Prometheus (version 0.0.4)
+def render():
+    with _lock:
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for name in sorted({key[0] for key in histograms} | {key[0] for key in counters}):
+        kind, text = HELP.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_labels(labels)} {value}')
+        for (metric, labels), (buckets, total, calls) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, value in zip(BUCKETS + (float('inf'),), buckets):
+                cumulative += value
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{name}_bucket{_labels(labels, [("le", le)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {calls}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,161 @@
+#Hash y verificacion de contraseñas con bcrypt fuera de los hilos que atienden peticiones
+#bcrypt consume ~250 ms de CPU por llamada: se ejecuta en un pool de procesos con un limite de trabajos en espera
+#(si se llena se responde 503 en lugar de encolar sin fin), y un limite barato de intentos fallidos de login
+#evita que la fuerza bruta gaste CPU en hashes.
+import os
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))  #costo de los hashes nuevos; los de menor costo se actualizan al iniciar sesion
+PASSWORD_HASH_PROCESSES = int(os.getenv('PASSWORD_HASH_PROCESSES', '2'))  #0 = en el mismo proceso
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '32'))  #hashes en curso o en espera como maximo
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+LOGIN_MAX_FAILURES = int(os.getenv('LOGIN_MAX_FAILURES', '5'))  #intentos fallidos por correo dentro de la ventana, 0 = sin limite
+LOGIN_MAX_FAILURES_IP = int(os.getenv('LOGIN_MAX_FAILURES_IP', '50'))  #por IP es mas alto: muchos estudiantes salen por la misma IP de la universidad
+LOGIN_FAILURE_WINDOW = int(os.getenv('LOGIN_FAILURE_WINDOW', '900'))  #segundos
+MAX_PASSWORD_BYTES = 72  #bcrypt solo usa los primeros 72 bytes
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_QUEUE)
+
+class HashQueueFull(Exception):
+    pass
+
+#Funciones que corren en el pool (deben poder importarse desde el proceso hijo)
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(pw_hash, password):
+    try:
+        return bcrypt.checkpw(password, pw_hash.encode('utf-8'))
+    except ValueError:  #hash guardado con formato invalido
+        return False
+
+def _password(password):
+    return password.encode('utf-8')[:MAX_PASSWORD_BYTES]  #igual que bcrypt 4, que recortaba en silencio
+
+def hashPool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+#Ejecuta fn en el pool respetando el limite de la cola; lanza HashQueueFull si esta lleno.
+#El lugar en la cola se libera cuando el hash termina (o se cancela), no cuando se deja de esperar: si no, los
+#clientes que reintentan tras un timeout acumularian hashes en el pool sin limite
+def _run(fn, *args, retry=True):
+    if not _slots.acquire(blocking=False):
+        raise HashQueueFull()
+    if PASSWORD_HASH_PROCESSES <= 0:
+        try:
+            return fn(*args)
+        finally:
+            _slots.release()
+    pool = hashPool()
+    try:
+        future = pool.submit(fn, *args)
+    except RuntimeError:  #BrokenProcessPool o pool recien descartado por otro hilo
+        _slots.release()
+        future = None
+    if future is not None:
+        future.add_done_callback(lambda _: _slots.release())
+        try:
+            return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+        except FutureTimeout:
+            future.cancel()  #si aun no empezo sale de la cola; si ya corre, su lugar se libera al terminar
+            raise HashQueueFull()
+        except BrokenProcessPool:
+            pass
+    #Un proceso del pool murio: se descarta ese pool y se reintenta una vez en uno nuevo
+    _discard(pool)
+    if not retry:
+        raise HashQueueFull()
+    return _run(fn, *args, retry=False)
+
+def hashPassword(password):
+    return _run(_hash, _password(password), BCRYPT_ROUNDS)
+
+def checkPassword(pw_hash, password):
+    return _run(_check, pw_hash, _password(password))
+
+#True si el hash se genero con un costo menor al configurado ("$2b$10$..." -> 10)
+def needsRehash(pw_hash):
+    try:
+        return int(pw_hash.split('$')[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def passwordTooLong(password):
+    return len(password.encode('utf-8')) > MAX_PASSWORD_BYTES
+
+#Arranca los procesos del pool (WARMUP=hash); un hash de costo minimo por proceso, solo para que inicien
+def warmup():
+    if PASSWORD_HASH_PROCESSES <= 0:
+        return
+    for future in [hashPool().submit(_hash, b'warmup', 4) for _ in range(PASSWORD_HASH_PROCESSES)]:
+        future.result(timeout=PASSWORD_HASH_TIMEOUT)
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+#Descarta el pool si sigue siendo el actual (otro hilo pudo haberlo reemplazado ya)
+def _discard(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+#Intentos fallidos recientes por clave (correo o IP), en memoria de cada worker
+class LoginThrottle:
+    def __init__(self, max_failures=None, window=None):
+        self.max_failures = max_failures if max_failures is not None else LOGIN_MAX_FAILURES
+        self.window = window if window is not None else LOGIN_FAILURE_WINDOW
+        self._failures = {}  #clave -> deque con los tiempos de los ultimos fallos
+        self._lock = threading.Lock()
+        self._blocked = 0
+
+    def _recent(self, key, now):
+        times = self._failures.get(key)
+        while times and now - times[0] > self.window:
+            times.popleft()
+        return times
+
+    #Segundos que faltan para poder intentar de nuevo, o 0 si se permite el intento
+    def retry_after(self, key):
+        if not self.max_failures:
+            return 0
+        now = time.time()
+        with self._lock:
+            times = self._recent(key, now)
+            if not times or len(times) < self.max_failures:
+                return 0
+            self._blocked += 1
+            return int(self.window - (now - times[0])) + 1
+
+    def failure(self, key):
+        if not self.max_failures:
+            return
+        with self._lock:
+            if len(self._failures) > 100000:  #limite de memoria ante muchas claves distintas
+                self._failures.clear()
+            self._failures.setdefault(key, deque(maxlen=self.max_failures)).append(time.time())
+
+    def success(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"tracked": len(self._failures), "blocked": self._blocked}
@@ -0,0 +1,245 @@
+#Etapa de extraccion de los PDF subidos, aislada de los hilos que atienden peticiones
+#1) La subida se copia por partes a un archivo temporal (nunca un bytes completo en memoria) y se calcula su hash
+#2) PyMuPDF corre en un pool de procesos, pagina por pagina, con limites de bytes, paginas, tiempo y memoria.
+#Si un PDF se queda bloqueado dentro de una pagina el limite por pagina no alcanza: al vencer la espera se
+#termina solo el proceso que lo extraia y se crea otro, los PDF de los demas procesos siguen sin enterarse.
+#Cada PDF espera a tener un proceso libre antes de empezar a contar su tiempo, asi un PDF normal que llega
+#detras de dos lentos no vence por el tiempo que paso en la fila.
+#No se usa ProcessPoolExecutor: si uno de sus procesos muere, termina todos los demas y falla todo lo pendiente.
+import os
+import queue
+import asyncio
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from pdf_summary import pdfChunks, preload
+
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', str(20 * 1024 * 1024)))  #tamaño maximo de la subida
+PDF_EXTRACT_TIMEOUT = float(os.getenv('PDF_EXTRACT_TIMEOUT', '30'))  #segundos maximos extrayendo texto
+PDF_EXTRACT_PROCESSES = int(os.getenv('PDF_EXTRACT_PROCESSES', '2'))  #0 = extraer en el mismo proceso
+PDF_EXTRACT_MAX_MEMORY_MB = int(os.getenv('PDF_EXTRACT_MAX_MEMORY_MB', '1024'))  #memoria virtual de cada proceso, 0 = sin limite
+SPOOL_CHUNK = 1024 * 1024
+#Tamaño maximo de la peticion de subida: el PDF mas el formulario multipart. Se revisa antes de leer el cuerpo
+PDF_MAX_REQUEST_BYTES = PDF_MAX_BYTES + 1024 * 1024
+TIMEOUT_MESSAGE = "⚠️ El PDF tardó demasiado en procesarse."
+ERROR_MESSAGE = "⚠️ No se pudo procesar el PDF."
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def sizeMessage(max_bytes=None):
+    return f"⚠️ El PDF supera el tamaño máximo de {round((max_bytes or PDF_MAX_BYTES) / (1024 * 1024), 1):g} MB."
+
+class Spooler:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hash = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(suffix='.pdf', dir=os.getenv('PDF_SPOOL_DIR') or None)
+        self.file = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise ValueError(sizeMessage(self.max_bytes))
+        self.hash.update(data)
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+        return self.path, self.hash.hexdigest()
+
+    def discard(self):
+        self.file.close()
+        removeSpool(self.path)
+
+#Copia el archivo subido (cualquier objeto con read(n)) a un temporal; retorna (ruta, sha256)
+def spoolUpload(stream, max_bytes=None):
+    spooler = Spooler(max_bytes or PDF_MAX_BYTES)
+    while True:
+        data = stream.read(SPOOL_CHUNK)
+        if not data:
+            return spooler.close()
+        spooler.write(data)
+
+#Version asyncio para los UploadFile de Starlette
+async def aspoolUpload(upload, max_bytes=None):
+    spooler = Spooler(max_bytes or PDF_MAX_BYTES)
+    while True:
+        data = await upload.read(SPOOL_CHUNK)
+        if not data:
+            return spooler.close()
+        spooler.write(data)
+
+def removeSpool(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+#Limite de memoria de cada proceso del pool: un PDF que pide demasiada memoria falla (MemoryError) en lugar
+#de afectar al servidor. resource solo existe en sistemas POSIX
+def _initWorker(max_memory_mb):
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    limit = max_memory_mb * 1024 * 1024
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+#Proceso de extraccion: recibe (funcion, args, kwargs) por su extremo del Pipe y responde (ok, resultado o excepcion)
+def _serve(conn, max_memory_mb):
+    _initWorker(max_memory_mb)
+    while True:
+        try:
+            fn, args, kwargs = conn.recv()
+        except EOFError:  #el servidor cerro el Pipe
+            return
+        try:
+            result = (True, fn(*args, **kwargs))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception:  #resultado o excepcion que no se puede enviar
+            conn.send((False, ValueError(ERROR_MESSAGE)))
+
+class ExtractWorker:
+    def __init__(self, context, max_memory_mb):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, max_memory_mb), name='pdf-extract', daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, fn, args, kwargs):
+        self.conn.send((fn, args, kwargs))
+
+    #Resultado de la tarea enviada; TimeoutError si no termina en timeout segundos, EOFError si el proceso murio
+    def result(self, timeout):
+        if not self.conn.poll(timeout):
+            raise TimeoutError()
+        ok, value = self.conn.recv()
+        if ok:
+            return value
+        raise value
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+class ExtractPool:
+    def __init__(self, processes, max_memory_mb):
+        self.processes = processes
+        self.max_memory_mb = max_memory_mb
+        self._context = multiprocessing.get_context('spawn')  #"spawn" evita heredar hilos y conexiones del servidor
+        self._slots = queue.Queue()  #un lugar por proceso; None = proceso por crear (al primer uso o tras terminarlo)
+        for _ in range(processes):
+            self._slots.put(None)
+        self._lock = threading.Lock()
+        self._killed = 0
+
+    #Espera un proceso libre (sin limite de tiempo: la espera en la fila no cuenta para el PDF)
+    def _acquire(self):
+        worker = self._slots.get()
+        if worker is None or not worker.process.is_alive():
+            if worker is not None:
+                worker.kill()
+            try:
+                worker = ExtractWorker(self._context, self.max_memory_mb)
+            except BaseException:
+                self._slots.put(None)
+                raise
+        return worker
+
+    def _discard(self, worker):
+        worker.kill()
+        with self._lock:
+            self._killed += 1
+        self._slots.put(None)
+
+    #Corre fn en un proceso libre; los segundos empiezan cuando el proceso recibe la tarea. Si vencen se termina
+    #solo ese proceso (TimeoutError); si el proceso muere (memoria, falla de PyMuPDF) lanza EOFError
+    def run(self, seconds, fn, *args, **kwargs):
+        worker = self._acquire()
+        try:
+            worker.send(fn, args, kwargs)
+            value = worker.result(seconds)
+        except (TimeoutError, EOFError, OSError):
+            self._discard(worker)
+            raise
+        except BaseException:  #excepcion de fn: el proceso sigue sano
+            self._slots.put(worker)
+            raise
+        self._slots.put(worker)
+        return value
+
+    #Crea los procesos que falten y corre fn una vez en cada uno (se crean en paralelo)
+    def warmup(self, fn, timeout):
+        workers = [self._acquire() for _ in range(self.processes)]
+        for worker in workers:
+            worker.send(fn, (), {})
+        for worker in workers:
+            try:
+                worker.result(timeout)
+            except (TimeoutError, EOFError, OSError):
+                self._discard(worker)
+            else:
+                self._slots.put(worker)
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._slots.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.kill()
+
+    def stats(self):
+        with self._lock:
+            return {"processes": self.processes, "idle": self._slots.qsize(), "killed": self._killed}
+
+#Pool de procesos creado al primer uso
+def extractPool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ExtractPool(PDF_EXTRACT_PROCESSES, PDF_EXTRACT_MAX_MEMORY_MB)
+        return _pool
+
+#Bloques de texto del PDF en disco. El limite de tiempo se revisa en cada pagina dentro del proceso, y si
+#PyMuPDF se queda bloqueado en una sola pagina la espera del resultado vence y se termina ese proceso.
+def extractChunks(path):
+    if PDF_EXTRACT_PROCESSES <= 0:
+        return pdfChunks(path, timeout=PDF_EXTRACT_TIMEOUT)
+    try:
+        return extractPool().run(PDF_EXTRACT_TIMEOUT + 5, pdfChunks, path, timeout=PDF_EXTRACT_TIMEOUT)
+    except TimeoutError:
+        raise ValueError(TIMEOUT_MESSAGE)
+    except (EOFError, OSError, MemoryError):  #el proceso murio o el PDF supero PDF_EXTRACT_MAX_MEMORY_MB
+        raise ValueError(ERROR_MESSAGE)
+
+#Version asyncio: la espera del proceso corre en un hilo, fuera del event loop
+async def aextractChunks(path):
+    return await asyncio.to_thread(extractChunks, path)
+
+#Arranca los procesos del pool y carga PyMuPDF en cada uno (WARMUP=pdf)
+def warmup():
+    if PDF_EXTRACT_PROCESSES <= 0:
+        return preload()
+    extractPool().warmup(preload, PDF_EXTRACT_TIMEOUT)
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
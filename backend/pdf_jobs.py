@@ -0,0 +1,83 @@
+#Cola de trabajos en segundo plano para procesar PDF sin bloquear la peticion HTTP
+#Un numero fijo de hilos atiende la cola; si la cola esta llena submit lanza QueueFull (el endpoint responde 429).
+#El estado de los trabajos vive en memoria del proceso: el front debe consultar al mismo worker que recibio el PDF
+import os
+import time
+import uuid
+import queue
+import threading
+from queue import Full as QueueFull
+
+class JobQueue:
+    def __init__(self, workers=None, max_queued=None, ttl=None):
+        self.workers = workers or int(os.getenv('PDF_JOB_WORKERS', '2'))  #PDF procesados a la vez
+        self.ttl = ttl or int(os.getenv('PDF_JOB_TTL', '3600'))  #segundos que se guarda el estado de un trabajo terminado
+        self._queue = queue.Queue(maxsize=max_queued or int(os.getenv('PDF_JOB_QUEUE', '10')))
+        self._jobs = {}  #job_id -> estado
+        self._lock = threading.Lock()
+        self._threads = []
+
+    #Los hilos se crean con el primer trabajo
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'pdf-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    #Encola fn(*args) y retorna el id del trabajo
+    def submit(self, fn, *args, **info):
+        self._start()
+        self._sweep()
+        job_id = uuid.uuid4().hex
+        job = dict(info, id=job_id, status='queued', created=time.time())
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self._queue.put_nowait((job_id, fn, args))
+        except QueueFull:
+            with self._lock:
+                del self._jobs[job_id]
+            raise
+        return job_id
+
+    def _work(self):
+        while True:
+            job_id, fn, args = self._queue.get()
+            self._update(job_id, status='running', started=time.time())
+            try:
+                result = fn(*args)
+                self._update(job_id, status='done', result=result, finished=time.time())
+            except ValueError as e:  #errores con mensaje para el usuario (PDF invalido, sin texto, ...)
+                self._update(job_id, status='error', error=str(e), finished=time.time())
+            except Exception as e:
+                print("Error en trabajo PDF:", e)
+                self._update(job_id, status='error', error='Error al procesar el PDF.', finished=time.time())
+            finally:
+                self._queue.task_done()
+
+    def _update(self, job_id, **values):
+        with self._lock:
+            self._jobs[job_id].update(values)
+
+    #Copia del estado del trabajo o None si no existe
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    #Elimina los trabajos terminados hace mas de ttl segundos
+    def _sweep(self):
+        limit = time.time() - self.ttl
+        with self._lock:
+            for job_id in [k for k, job in self._jobs.items() if job.get('finished', time.time()) < limit]:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize(), "max_queued": self._queue.maxsize, "jobs": counts}
@@ -0,0 +1,101 @@
+#PDF descargable con el resumen, generado con ReportLab una sola vez por resumen
+#Los bytes se guardan en disco con el hash del resumen como nombre; las descargas siguientes solo leen el archivo
+import os
+import time
+import hashlib
+import threading
+from io import BytesIO
+
+_summary_style = None
+
+#Estilo del resumen, se crea una sola vez con el primer PDF; ReportLab tambien se importa recien ahi (~140 ms)
+def summaryStyle():
+    global _summary_style
+    if _summary_style is None:
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        _summary_style = ParagraphStyle(
+            name='Custom',
+            parent=getSampleStyleSheet()['Normal'],
+            fontName='Helvetica',
+            fontSize=14,
+            leading=18  # espacio entre líneas
+        )
+    return _summary_style
+
+#Genera los bytes del PDF con el resumen, una linea por parrafo
+def renderSummary(filename, resumen):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    from reportlab.lib.pagesizes import letter
+    style = summaryStyle()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        title=f"Resumen de {filename}",
+        leftMargin=50,
+        rightMargin=50,
+        topMargin=50,
+        bottomMargin=50
+    )
+    story = [Paragraph(line, style) for line in resumen.split('\n')]
+    doc.build(story)
+    return buffer.getvalue()
+
+class RenderCache:
+    SWEEP_EVERY = 600  #segundos entre limpiezas
+
+    def __init__(self, folder=None, max_files=None):
+        self.folder = folder or os.getenv('PDF_RENDER_DIR', 'rendered')
+        self.max_files = max_files or int(os.getenv('PDF_RENDER_MAX_FILES', '2000'))  #se eliminan los usados hace mas tiempo
+        os.makedirs(self.folder, exist_ok=True)
+        self._last_sweep = 0
+        self._stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    #Retorna (ruta, etag) del PDF del resumen, generandolo si no esta en disco.
+    #El titulo del documento lleva el nombre del archivo, por eso tambien forma parte del hash
+    def get(self, filename, resumen):
+        etag = hashlib.sha256(f'{filename}\0{resumen}'.encode('utf-8')).hexdigest()
+        path = os.path.join(self.folder, etag + '.pdf')
+        try:
+            os.utime(path)  #marca de uso para la limpieza
+        except FileNotFoundError:  #no esta, o el sweep de otro worker lo acaba de eliminar: se genera de nuevo
+            pass
+        else:
+            with self._lock:
+                self._stats["hits"] += 1
+            return path, etag
+        data = renderSummary(filename, resumen)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)  #escritura atomica, otro worker nunca lee un archivo a medias
+        with self._lock:
+            self._stats["misses"] += 1
+        if time.time() - self._last_sweep > self.SWEEP_EVERY:
+            self._last_sweep = time.time()
+            self.sweep()
+        return path, etag
+
+    #Elimina los PDF usados hace mas tiempo por encima de max_files
+    def sweep(self):
+        files = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.pdf'):
+                try:
+                    files.append((os.path.getmtime(os.path.join(self.folder, name)), name))
+                except FileNotFoundError:  #eliminado por el sweep de otro worker
+                    pass
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, name in files[:len(files) - self.max_files]:
+            path = os.path.join(self.folder, name)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
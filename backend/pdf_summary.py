@@ -0,0 +1,133 @@
+#Resumen de PDF largos en dos fases (map-reduce)
+#1) Se extrae el texto pagina por pagina y se agrupa en bloques que caben en el presupuesto de tokens
+#2) Cada bloque se resume en paralelo (con un maximo de llamadas simultaneas a Groq)
+#3) Los resumenes parciales se combinan en el resumen final de maximo 800 palabras
+#Asi el tiempo depende del paralelismo y no de la cantidad de paginas
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '200'))  #paginas maximas aceptadas por PDF
+PDF_CHUNK_TOKENS = int(os.getenv('PDF_CHUNK_TOKENS', '3000'))  #tokens de texto por bloque enviado a la IA
+PDF_SUMMARY_WORKERS = int(os.getenv('PDF_SUMMARY_WORKERS', '4'))  #llamadas a Groq simultaneas por PDF
+PDF_TEXT_PROBE_PAGES = int(os.getenv('PDF_TEXT_PROBE_PAGES', '3'))  #paginas revisadas para detectar PDF escaneados
+CHARS_PER_TOKEN = 4  #estimacion de caracteres por token, suficiente para armar los bloques
+
+#Mensajes para el resumen final del PDF (o de los resumenes parciales)
+def pdfMessages(prompt):
+    return [
+        {"role": "system", "content": ("Eres un asistente que resume textos largos de forma clara y concisa, que incluye todas las ideas principales, pero sin exceder 800 palabras."
+        "Evita usar asteriscos (*) para resaltar texto o crear listas. Usa texto plano y saltos de línea únicamente con \n para separar los elementos o párrafos y mejorar la legibilidad."
+        "No agregues información que no esta en el texto que te envió el usuario"
+        "Agregale un título como primera línea")},
+        {"role": "user", "content": prompt}
+    ]
+
+#Mensajes para resumir un bloque del documento
+def chunkMessages(text, part, total):
+    return [
+        {"role": "system", "content": (f"Eres un asistente que resume la parte {part} de {total} de un documento largo. "
+        "Resume de forma clara y concisa las ideas principales, datos y conclusiones de esta parte en máximo 250 palabras. "
+        "Usa texto plano, sin asteriscos ni títulos. No agregues información que no esta en el texto.")},
+        {"role": "user", "content": text}
+    ]
+
+#Genera el texto de cada pagina sin cargar todo el documento en un solo string.
+#source es la ruta del PDF (o sus bytes); deadline es el time.monotonic() limite para extraer.
+#Si las primeras paginas solo tienen imagenes (PDF escaneado) se rechaza antes de seguir
+def iterPages(source, max_pages=None, deadline=None):
+    import fitz # PyMuPDF, se carga con el primer PDF (~130 ms y memoria que no usan los workers sin PDF)
+    max_pages = max_pages or PDF_MAX_PAGES
+    try:
+        pdf_file = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    except Exception:
+        raise ValueError("⚠️ El archivo no es un PDF válido.")
+    try:
+        if pdf_file.page_count > max_pages:
+            raise ValueError(f"⚠️ Este PDF contiene más de {max_pages} páginas.")
+        probe = min(PDF_TEXT_PROBE_PAGES, pdf_file.page_count)
+        image_pages = 0
+        for number, page in enumerate(pdf_file, 1):
+            if deadline and time.monotonic() > deadline:
+                raise ValueError("⚠️ El PDF tardó demasiado en procesarse.")
+            text = page.get_text()
+            if number <= probe and not text.strip() and page.get_images():
+                image_pages += 1
+                if image_pages == probe:
+                    raise ValueError("⚠️ Este PDF parece escaneado (solo imágenes) y no contiene texto para resumir.")
+            yield text
+    finally:
+        pdf_file.close()
+
+#Carga PyMuPDF por adelantado (WARMUP=pdf), tambien en los procesos del pool de extraccion: abrir un documento
+#vacio inicializa la libreria MuPDF ademas de importar el modulo
+def preload():
+    import fitz # PyMuPDF
+    fitz.open().close()
+
+#Vuelve a agrupar los resumenes parciales; si ya no se reducen se juntan todos en un bloque
+def regroup(partials, total, chunk_tokens=None):
+    chunks = list(chunkTexts(partials, chunk_tokens))
+    return chunks if len(chunks) < total else ['\n'.join(partials)]
+
+#Agrupa los textos en bloques de hasta chunk_tokens, partiendo los textos que no caben en un bloque
+def chunkTexts(texts, chunk_tokens=None):
+    max_chars = (chunk_tokens or PDF_CHUNK_TOKENS) * CHARS_PER_TOKEN
+    current = []
+    size = 0
+    for text in texts:
+        text = text.strip()
+        while len(text) > max_chars:  #pagina mas grande que un bloque: se corta en un salto de linea
+            cut = text.rfind('\n', 0, max_chars)
+            cut = cut if cut > max_chars // 2 else max_chars
+            if current:
+                yield '\n'.join(current)
+                current, size = [], 0
+            yield text[:cut]
+            text = text[cut:].strip()
+        if not text:
+            continue
+        if size + len(text) > max_chars and current:
+            yield '\n'.join(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+    if current:
+        yield '\n'.join(current)
+
+#Extrae el PDF y retorna sus bloques, si no se puede resumir lanza ValueError con el mensaje para el usuario
+def pdfChunks(source, max_pages=None, chunk_tokens=None, timeout=None):
+    deadline = time.monotonic() + timeout if timeout else None
+    chunks = list(chunkTexts(iterPages(source, max_pages, deadline), chunk_tokens))
+    if not chunks:
+        raise ValueError("⚠️ Este PDF no contiene texto para resumir.")
+    return chunks
+
+#Resume los bloques con groq.chat usando un pool de hilos; GroqError se propaga a quien llama
+def summarize(groq, chunks, workers=None, chunk_tokens=None):
+    if len(chunks) == 1:  #documento corto: una sola llamada, como antes
+        return groq.chat(pdfMessages(chunks[0]), name="pdf", temperature=0.7)
+    with ThreadPoolExecutor(max_workers=workers or PDF_SUMMARY_WORKERS) as pool:
+        while len(chunks) > 1:  #los resumenes parciales se vuelven a agrupar hasta que caben en un bloque
+            total = len(chunks)
+            partials = list(pool.map(
+                lambda item: groq.chat(chunkMessages(item[1], item[0], total), name="pdf_chunk", temperature=0.7),
+                enumerate(chunks, 1)
+            ))
+            chunks = regroup(partials, total, chunk_tokens)
+    return groq.chat(pdfMessages(chunks[0]), name="pdf", temperature=0.7)
+
+#Version asyncio de summarize, el semaforo limita las llamadas simultaneas
+async def asummarize(groq, chunks, workers=None, chunk_tokens=None):
+    semaphore = asyncio.Semaphore(workers or PDF_SUMMARY_WORKERS)
+
+    async def summarizeChunk(text, part, total):
+        async with semaphore:
+            return await groq.achat(chunkMessages(text, part, total), name="pdf_chunk", temperature=0.7)
+
+    while len(chunks) > 1:
+        total = len(chunks)
+        partials = await asyncio.gather(*(summarizeChunk(text, part, total) for part, text in enumerate(chunks, 1)))
+        chunks = regroup(partials, total, chunk_tokens)
+    return await groq.achat(pdfMessages(chunks[0]), name="pdf", temperature=0.7)
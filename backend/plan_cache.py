@@ -0,0 +1,146 @@
+#Cache de planes NL->SQL: cuando el SQL generado por la IA se ejecuta con resultados se generaliza en una plantilla
+#"libros del autor {valor}" -> SELECT ... LIKE UPPER(UNACCENT(:p0)), con el valor como parametro enlazado.
+#Las preguntas siguientes con la misma forma enlazan el nuevo valor y no llaman a la IA para traducir.
+#Al usar parametros en lugar de literales el SQL es siempre el mismo texto y la BD puede reutilizar el plan.
+#Solo se aprende una plantilla si sus palabras dicen en que columna va el valor ("del autor", "sobre", "de la
+#editorial"): "libros de X" puede ser un autor o una materia y no se guarda, asi no se reutiliza con el otro sentido.
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from response_cache import normalize
+from catalog_index import COMPLEX_WORDS, CUES, FIELD_COLUMNS
+
+#Literal de texto de SQL, con '' como comilla escapada
+LITERAL_RE = re.compile(r"'((?:[^']|'')*)'")
+#Solo se generalizan los literales que se comparan sin tildes (UNACCENT('...')), porque el valor enlazado va normalizado
+UNACCENT_BEFORE_RE = re.compile(r"UNACCENT\(\s*$", re.IGNORECASE)
+SLOT_EXTRA_WORDS = 2  #palabras de mas que puede tener el valor respecto al de la pregunta original
+
+#Columna con la que se compara cada literal de texto del SQL, o None si alguno no se compara con una sola columna.
+#sqlglot ya esta cargado: solo se aprenden consultas que pasaron por guardQuery
+def literalColumns(sql_query):
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import SqlglotError
+    try:
+        tree = sqlglot.parse_one(sql_query, read='postgres')
+    except SqlglotError:
+        return None
+    columns = []
+    for literal in tree.find_all(exp.Literal):
+        if not literal.is_string:
+            continue
+        node = literal.parent
+        while node is not None and not isinstance(node, exp.Predicate):
+            node = node.parent
+        names = {column.name.lower() for column in node.find_all(exp.Column)} if node is not None else set()
+        if len(names) != 1:
+            return None
+        columns.append(names.pop())
+    return columns
+
+#True si las palabras alrededor del valor nombran la columna ("editorial", "autores") o su campo con una palabra
+#clave de busqueda ("del autor" -> autor, "sobre" -> tema o titulo). "de" sola no indica ningun campo
+def namesColumn(words, column):
+    if any(word == column or word.rstrip('s') == column for word in words):
+        return True
+    text = ' '.join(words)
+    fields = {field for field, pattern in FIELD_COLUMNS.items() if pattern.search(column)}
+    for pattern, cue_fields in CUES:
+        if pattern != 'de' and fields.intersection(cue_fields) and re.search(rf'(?:^|\s)(?:{pattern})(?:\s|$)', text):
+            return True
+    return False
+
+class PlanCache:
+    def __init__(self, max_items=None, ttl=None):
+        self.max_items = max_items or int(os.getenv('SQL_PLAN_CACHE_SIZE', '500'))
+        self.ttl = ttl if ttl is not None else int(os.getenv('SQL_PLAN_CACHE_TTL', '86400'))  #0 = no expira
+        self._plans = OrderedDict()  #(palabras antes del valor, palabras despues) -> (sql, [(param, prefijo, sufijo)], largo del valor, ts)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "learned": 0}
+
+    #Generaliza el SQL de una pregunta en plantilla; retorna False si no tiene exactamente un valor de busqueda ubicable
+    def learn(self, question, sql_query):
+        tokens = normalize(question).split()
+        literals = list(LITERAL_RE.finditer(sql_query))
+        if not literals or any(re.search(r'\d', token) for token in tokens):
+            return False
+        if any('%' in m.group(1).strip('%') or '_' in m.group(1) for m in literals):
+            return False  #comodines en medio del valor
+        values = {normalize(m.group(1).replace("''", "'").strip('%')) for m in literals}
+        if len(values) != 1 or not next(iter(values)):
+            return False
+        slot = next(iter(values)).split()
+        start = self._find(tokens, slot)
+        if start is None:
+            return False
+        prefix, suffix = tuple(tokens[:start]), tuple(tokens[start + len(slot):])
+        if len(prefix) + len(suffix) < 2:  #la pregunta era casi solo el valor, la plantilla coincidiria con cualquier cosa
+            return False
+        columns = literalColumns(sql_query)
+        if not columns or not all(namesColumn(prefix + suffix, column) for column in columns):
+            return False  #las palabras de la pregunta no dicen a que columna corresponde el valor
+        parts, params, last = [], [], 0
+        for i, m in enumerate(literals):
+            if not UNACCENT_BEFORE_RE.search(sql_query[:m.start()]):
+                return False
+            raw = m.group(1)
+            params.append((f'p{i}', '%' if raw.startswith('%') else '', '%' if raw.endswith('%') and len(raw) > 1 else ''))
+            parts.append(sql_query[last:m.start()] + f':p{i}')
+            last = m.end()
+        template = ''.join(parts) + sql_query[last:]
+        with self._lock:
+            self._plans[(prefix, suffix)] = (template, params, len(slot), time.time())
+            self._plans.move_to_end((prefix, suffix))
+            while len(self._plans) > self.max_items:
+                self._plans.popitem(last=False)
+            self._stats["learned"] += 1
+        return True
+
+    #Ultima aparicion del valor en la pregunta (normalmente va al final)
+    def _find(self, tokens, slot):
+        for start in range(len(tokens) - len(slot), -1, -1):
+            if tokens[start:start + len(slot)] == slot:
+                return start
+        return None
+
+    #Retorna (sql, parametros) para una pregunta con la forma de una plantilla conocida, o None
+    def match(self, question):
+        tokens = normalize(question).split()
+        best = None
+        with self._lock:
+            if not any(re.search(r'\d', token) for token in tokens):
+                for i in range(len(tokens)):
+                    for j in range(len(tokens), i, -1):
+                        key = (tuple(tokens[:i]), tuple(tokens[j:]))
+                        plan = self._plans.get(key)
+                        if plan is None:
+                            continue
+                        if self.ttl and time.time() - plan[3] > self.ttl:
+                            del self._plans[key]
+                            continue
+                        slot = tokens[i:j]
+                        #el valor no puede absorber filtros extra ("lopez publicados despues de...")
+                        if len(slot) > plan[2] + SLOT_EXTRA_WORDS or COMPLEX_WORDS.intersection(slot):
+                            continue
+                        if best is None or len(slot) < len(best[1]):
+                            best = (key, slot, plan)
+            if best:
+                self._plans.move_to_end(best[0])
+            self._stats["hits" if best else "misses"] += 1
+        if best is None:
+            return None
+        key, slot, (template, params, _, _) = best
+        value = ' '.join(slot)
+        return template, {name: prefix + value + suffix for name, prefix, suffix in params}
+
+    #Descarta las plantillas (por ejemplo si cambio el esquema del catalogo)
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, templates=len(self._plans))
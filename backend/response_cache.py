@@ -0,0 +1,134 @@
+#Cache de respuestas de la IA por (prompt de la opcion, mensaje normalizado)
+#Capa 1: coincidencia exacta del mensaje normalizado (minusculas, sin tildes ni signos, espacios simples)
+#Capa 2 (desactivada por defecto, y opcional por llamada): preguntas casi iguales, comparando firmas MinHash de
+#trigramas de caracteres con LSH por bandas para no recorrer todo el cache. Ambas capas con TTL, limite de tamaño
+#(LRU) y contadores. Los trigramas no distinguen "con comida" de "sin comida" ni "lunes" de "martes" (similitud
+#~0.7-0.8), por eso la capa 2 pide un umbral alto y ademas rechaza las preguntas que difieren en una negacion,
+#un dia, un mes o un numero.
+import os
+import re
+import time
+import zlib
+import random
+import threading
+import unicodedata
+from collections import OrderedDict
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  #bandas de 4 valores: dos preguntas comparten alguna banda si se parecen lo suficiente
+MERSENNE_PRIME = (1 << 61) - 1
+_rnd = random.Random(7)
+_PERMUTATIONS = [(_rnd.randrange(1, MERSENNE_PRIME), _rnd.randrange(0, MERSENNE_PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+#Palabras (ya normalizadas) que cambian la respuesta aunque el resto de la pregunta sea igual
+GUARD_WORDS = {
+    'no', 'sin', 'ni', 'nunca', 'jamas', 'tampoco', 'nada', 'nadie', 'ningun', 'ninguna', 'ninguno',
+    'lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'sabados', 'domingo', 'domingos',
+    'hoy', 'manana', 'ayer', 'feriado', 'feriados', 'festivo', 'festivos', 'vacaciones',
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto', 'septiembre', 'setiembre',
+    'octubre', 'noviembre', 'diciembre',
+    'uno', 'una', 'dos', 'tres', 'cuatro', 'cinco', 'seis', 'siete', 'ocho', 'nueve', 'diez', 'once', 'doce',
+    'quince', 'veinte', 'treinta', 'cien', 'mil', 'primer', 'primero', 'primera', 'segundo', 'segunda', 'tercer', 'tercero', 'tercera',
+}
+
+#"¿Cuál es el HORARIO?" -> "cual es el horario"
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text).split())
+
+def signature(text):
+    text = f' {text} '
+    shingles = {zlib.crc32(text[i:i + 3].encode('utf-8')) for i in range(len(text) - 2)} or {0}
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in shingles) for a, b in _PERMUTATIONS)
+
+#Negaciones, dias, meses y numeros del mensaje normalizado: dos preguntas solo son casi iguales si coinciden en estas
+def guards(text):
+    return frozenset(word for word in text.split() if word in GUARD_WORDS or any(c.isdigit() for c in word))
+
+def similarity(sig1, sig2):
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+class ResponseCache:
+    def __init__(self, max_items=None, ttl=None, near_threshold=None):
+        self.max_items = max_items or int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+        self.ttl = ttl if ttl is not None else int(os.getenv('RESPONSE_CACHE_TTL', '86400'))  #0 = no expira
+        #similitud minima (0-1) para la capa de casi duplicados; 0 (por defecto) la desactiva, si se activa usar 0.9 o mas
+        self.near_threshold = near_threshold if near_threshold is not None else float(os.getenv('RESPONSE_CACHE_NEAR_THRESHOLD', '0'))
+        self._items = OrderedDict()  #(namespace, mensaje normalizado) -> (respuesta, ts, firma)
+        self._buckets = {}  #(namespace, banda, valores) -> claves
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "near_hits": 0, "near_rejected": 0, "misses": 0}
+
+    def _bands(self, namespace, sig):
+        rows = MINHASH_PERMUTATIONS // LSH_BANDS
+        return [(namespace, band, sig[band * rows:(band + 1) * rows]) for band in range(LSH_BANDS)]
+
+    def _remove(self, key):
+        answer, ts, sig = self._items.pop(key)
+        for bucket in self._bands(key[0], sig):
+            keys = self._buckets.get(bucket)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def _fresh(self, key):
+        item = self._items.get(key)
+        if item and self.ttl and time.time() - item[1] > self.ttl:
+            self._remove(key)
+            return None
+        return item
+
+    #Respuesta guardada o None; con near=True tambien acepta una pregunta parecida de la misma opcion
+    def get(self, namespace, message, near=False):
+        key = (namespace, normalize(message))
+        with self._lock:
+            item = self._fresh(key)
+            if item:
+                self._items.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return item[0]
+            if not (near and self.near_threshold):
+                self._stats["misses"] += 1
+                return None
+        sig = signature(key[1])  #la firma se calcula fuera del lock
+        with self._lock:
+            candidates = set()
+            for bucket in self._bands(namespace, sig):
+                candidates.update(self._buckets.get(bucket, ()))
+            best, best_score = None, self.near_threshold
+            words = guards(key[1])
+            for candidate in candidates:
+                item = self._fresh(candidate)
+                if item:
+                    score = similarity(sig, item[2])
+                    if score < best_score:
+                        continue
+                    if guards(candidate[1]) != words:  #"con/sin comida", "lunes/martes", "3/5 libros"
+                        self._stats["near_rejected"] += 1
+                        continue
+                    best, best_score = candidate, score
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(best)
+            self._stats["near_hits"] += 1
+            return self._items[best][0]
+
+    def put(self, namespace, message, answer):
+        key = (namespace, normalize(message))
+        sig = signature(key[1])
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (answer, time.time(), sig)
+            for bucket in self._bands(namespace, sig):
+                self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._items) > self.max_items:
+                self._remove(next(iter(self._items)))  #se descarta la respuesta usada hace mas tiempo
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["exact_hits"] + self._stats["near_hits"] + self._stats["misses"]
+            hits = lookups - self._stats["misses"]
+            return dict(self._stats, items=len(self._items), hit_rate=hits / lookups if lookups else 0.0)
@@ -0,0 +1,118 @@
+#Validacion del SQL generado por la IA antes de ejecutarlo en el catalogo
+#Se analiza con sqlglot: una sola sentencia SELECT, solo tablas y columnas del catalogo, uniones solo por igualdad
+#de columnas entre las dos tablas, solo las funciones de ALLOWED_FUNCTIONS, OFFSET acotado y LIMIT obligatorio. En PostgreSQL ademas se revisa el costo estimado con EXPLAIN
+#y cada consulta tiene un statement_timeout, asi una consulta mala no bloquea la BD para todos.
+#sqlglot se importa con la primera consulta (~150 ms), los workers que no buscan en el catalogo no lo cargan.
+import os
+import json
+
+SQL_MAX_ROWS = int(os.getenv('SQL_MAX_ROWS', '15'))  #LIMIT maximo, se agrega si falta
+SQL_MAX_TABLES = int(os.getenv('SQL_MAX_TABLES', '2'))  #tablas por consulta, contando subconsultas
+SQL_MAX_OFFSET = int(os.getenv('SQL_MAX_OFFSET', '300'))  #OFFSET maximo, la BD igual lee y descarta esas filas
+SQL_MAX_COST = float(os.getenv('SQL_MAX_COST', '100000'))  #costo maximo del EXPLAIN de PostgreSQL, 0 = sin limite
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv('SQL_STATEMENT_TIMEOUT_MS', '5000'))  #0 = sin limite
+#Funciones permitidas, por el nombre de sqlglot (STRING_AGG es GROUP_CONCAT y CASE es IF); cualquier otra se rechaza,
+#tambien las que sqlglot conoce como REPEAT o LPAD, que sirven para generar textos enormes
+ALLOWED_FUNCTIONS = {'unaccent', 'upper', 'lower', 'trim', 'length', 'substring', 'concat', 'coalesce', 'nullif',
+                     'cast', 'if', 'case', 'extract', 'round', 'count', 'sum', 'avg', 'min', 'max', 'group_concat', 'exists'}
+FORBIDDEN = ('Insert', 'Update', 'Delete', 'Merge', 'Create', 'Drop', 'Alter', 'Command', 'Into', 'Lock')  #nodos de sqlglot.exp
+DIALECTS = {'postgresql': 'postgres', 'sqlite': 'sqlite', 'mysql': 'mysql'}
+
+class UnsafeQuery(ValueError):
+    pass
+
+#Retorna el SQL validado (con LIMIT) o lanza UnsafeQuery; columns es {tabla: [columnas]} de las tablas permitidas
+def guardQuery(sql_query, columns, dialect='postgresql', max_rows=None):
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import SqlglotError
+    max_rows = max_rows or SQL_MAX_ROWS
+    try:
+        statements = [s for s in sqlglot.parse(sql_query, read='postgres') if s is not None]  #la IA escribe SQL de PostgreSQL
+    except SqlglotError:
+        raise UnsafeQuery("No se pudo interpretar la consulta.")
+    if len(statements) != 1 or not isinstance(statements[0], exp.Select):
+        raise UnsafeQuery("Solo se permite una consulta SELECT.")
+    tree = statements[0]
+    if any(tree.find_all(*(getattr(exp, name) for name in FORBIDDEN))):
+        raise UnsafeQuery("Solo se permite una consulta SELECT.")
+
+    ctes = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    tables = [t for t in tree.find_all(exp.Table) if t.name not in ctes]
+    for table in tables:
+        if table.name not in columns or table.args.get('db'):
+            raise UnsafeQuery(f"Tabla no permitida: {table.sql()}")
+    if len(tables) > SQL_MAX_TABLES:
+        raise UnsafeQuery("La consulta usa demasiadas tablas.")
+    for join in tree.find_all(exp.Join):
+        if join.args.get('kind') == 'CROSS' or not (join.args.get('using') or joinsColumns(join, tables, columns)):
+            raise UnsafeQuery("No se permiten uniones sin una igualdad entre columnas de las dos tablas.")
+
+    allowed = {c for table in tables for c in columns[table.name]}
+    aliases = {a.alias for a in tree.find_all(exp.Alias)}
+    for column in tree.find_all(exp.Column):
+        if column.name not in allowed and column.name not in aliases:
+            raise UnsafeQuery(f"Columna no permitida: {column.name}")
+    for function in tree.find_all(exp.Func):
+        if isinstance(function, exp.Connector):  #AND y OR tambien son Func en sqlglot
+            continue
+        name = function.name if isinstance(function, exp.Anonymous) else function.sql_name()
+        if name.lower() not in ALLOWED_FUNCTIONS:
+            raise UnsafeQuery(f"Función no permitida: {name}")
+    for offset in tree.find_all(exp.Offset):
+        value = offset.expression
+        if not (isinstance(value, exp.Literal) and value.is_int and int(value.this) <= SQL_MAX_OFFSET):
+            raise UnsafeQuery(f"OFFSET máximo: {SQL_MAX_OFFSET}.")
+
+    limit = tree.args.get('limit')
+    value = limit.expression if limit else None
+    if not (isinstance(value, exp.Literal) and value.is_int and 0 < int(value.this) <= max_rows):
+        tree.limit(max_rows, copy=False)
+    for placeholder in list(tree.find_all(exp.Placeholder)):
+        placeholder.replace(exp.var(':' + placeholder.name))  #los parametros de las plantillas siguen como :nombre para text()
+    return tree.sql(dialect=DIALECTS.get(dialect, 'postgres'))
+
+#Tabla (alias o nombre) de una columna: la que la califica o la unica tabla de la consulta que la tiene
+def columnTable(column, tables, columns):
+    if column.table:
+        return column.table
+    owners = {t.alias_or_name for t in tables if column.name in columns[t.name]}
+    return owners.pop() if len(owners) == 1 else None
+
+#True si el ON de la union tiene, fuera de cualquier OR, una igualdad entre una columna de la tabla unida y una de
+#otra tabla. ON 1=1, ON a.x = a.y o una union solo por LIKE serian un producto cartesiano filtrado fila por fila
+def joinsColumns(join, tables, columns):
+    from sqlglot import exp
+    joined = join.this.alias_or_name
+    pending = [join.args.get('on')]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, exp.Paren):
+            pending.append(node.this)
+        elif isinstance(node, exp.And):
+            pending.extend((node.this, node.expression))
+        elif isinstance(node, exp.EQ) and isinstance(node.this, exp.Column) and isinstance(node.expression, exp.Column):
+            sides = {columnTable(node.this, tables, columns), columnTable(node.expression, tables, columns)}
+            if joined in sides and len(sides) == 2 and None not in sides:
+                return True
+    return False
+
+#Sentencias para limitar el tiempo de la consulta dentro de la transaccion actual (solo PostgreSQL)
+def timeoutStatement(dialect):
+    if dialect == 'postgresql' and SQL_STATEMENT_TIMEOUT_MS > 0:
+        return f"SET LOCAL statement_timeout = {SQL_STATEMENT_TIMEOUT_MS}"
+    return None
+
+def explainStatement(dialect, sql_query):
+    if dialect == 'postgresql' and SQL_MAX_COST > 0:
+        return "EXPLAIN (FORMAT JSON) " + sql_query
+    return None
+
+#Revisa el resultado del EXPLAIN (FORMAT JSON) contra el costo maximo
+def checkCost(plan):
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    cost = plan[0]['Plan']['Total Cost']
+    if cost > SQL_MAX_COST:
+        raise UnsafeQuery(f"La consulta es demasiado costosa ({cost:.0f}).")
+    return cost
@@ -0,0 +1,108 @@
+#Arranque del worker: variables de .env, perfil de tiempos de arranque y precarga opcional
+#STARTUP_PROFILE=1 imprime al terminar de cargar la app cuanto tardo cada etapa y los modulos mas lentos de importar
+#(con los dos primeros niveles de imports anidados), sin tener que correr python -X importtime.
+#WARMUP=db,catalog,pdf,... precarga esos subsistemas en un hilo apenas arranca el worker, para que la primera
+#peticion no pague la carga diferida (PyMuPDF, ReportLab, Babel, sqlglot, pools de procesos).
+import os
+import sys
+import time
+import builtins
+import threading
+
+STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', '0') == '1'
+STARTUP_PROFILE_TOP = int(os.getenv('STARTUP_PROFILE_TOP', '25'))  #modulos que se muestran en el perfil
+WARMUP = [name.strip() for name in os.getenv('WARMUP', '').split(',') if name.strip()]
+
+_started = None
+_marks = []  #(etapa, segundos)
+_imports = []  #(modulo, segundos, [(modulo, segundos)] de sus imports directos)
+_stack = []  #imports en curso; cada uno junta los tiempos de sus imports directos
+_original_import = builtins.__import__
+
+#Mide cada import nuevo (el modulo aun no estaba cargado) y lo asigna al import que lo pidio.
+#Solo se usa durante el arranque, que corre en un solo hilo
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    children = []
+    _stack.append(children)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - start
+        _stack.pop()
+        if _stack:
+            _stack[-1].append((name, elapsed))
+        else:
+            _imports.append((name, elapsed, children))
+
+#Busca el .env desde la carpeta del backend hacia arriba (igual que load_dotenv); python-dotenv solo se importa si existe
+def loadEnv():
+    folder = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(folder, '.env')
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return path
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+
+#Se llama antes de importar el resto del backend: muchos modulos leen sus variables de entorno al importarse
+def begin():
+    global _started
+    if _started is not None:
+        return
+    _started = time.perf_counter()
+    if STARTUP_PROFILE:
+        builtins.__import__ = _timed_import
+    loadEnv()
+    mark('env')
+
+#Cierra una etapa del arranque (tiempo desde la marca anterior)
+def mark(stage):
+    if _started is None:
+        return
+    now = time.perf_counter()
+    last = sum(seconds for _, seconds in _marks)
+    _marks.append((stage, now - _started - last))
+
+#Imprime el perfil y deja de medir los imports
+def report():
+    if not STARTUP_PROFILE or _started is None:
+        return
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - _started
+    print(f"Arranque en {total * 1000:.0f} ms:")
+    for stage, seconds in _marks:
+        print(f"  {stage:<24} {seconds * 1000:8.1f} ms")
+    print("Imports mas lentos (y lo que mas tardo dentro de cada uno):")
+    for name, seconds, children in sorted(_imports, key=lambda item: -item[1])[:STARTUP_PROFILE_TOP]:
+        print(f"  {name:<40} {seconds * 1000:8.1f} ms")
+        for child, child_seconds in sorted(children, key=lambda item: -item[1])[:3]:
+            if child_seconds >= 0.001:
+                print(f"    {child:<38} {child_seconds * 1000:8.1f} ms")
+    sys.stdout.flush()
+
+#Ejecuta en un hilo las precargas pedidas en WARMUP; tasks es {nombre: funcion}
+def warmup(tasks):
+    names = [name for name in WARMUP if name in tasks]
+    for name in WARMUP:
+        if name not in tasks:
+            print(f"WARMUP: subsistema desconocido '{name}' (opciones: {', '.join(tasks)})")
+    if not names:
+        return None
+    def run():
+        for name in names:
+            start = time.perf_counter()
+            try:
+                tasks[name]()
+                print(f"WARMUP {name}: {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"WARMUP {name} fallo: {e}")
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,121 @@
+#Almacenamiento de los resumenes de PDF (reemplaza el diccionario resumen_storage)
+#Los resumenes se guardan por hash del contenido del PDF: si alguien sube un PDF identico se reutiliza el resumen
+#sin llamar a la IA. Cada subida se registra por dueño (usuario o sesion de invitado) con un summary_id propio,
+#asi dos personas con "tarea.pdf" no se pisan. Hay un LRU en memoria sobre un archivo SQLite compartido por los workers.
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+class SummaryStore:
+    SWEEP_EVERY = 600  #segundos entre limpiezas
+
+    def __init__(self, path, memory_items=256, max_entries=10000, ttl=30 * 86400):
+        self.path = path
+        self.memory_items = memory_items  #resumenes en el LRU de memoria
+        self.max_entries = max_entries  #resumenes en disco, se eliminan los usados hace mas tiempo
+        self.ttl = ttl  #segundos sin uso antes de eliminar un resumen, 0 = no expira
+        self._memory = OrderedDict()  #pdf_hash -> resumen
+        self._lock = threading.Lock()
+        self._local = threading.local()  #una conexion por hilo
+        self._last_sweep = 0
+        self._stats = {"hits": 0, "misses": 0}
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS summaries (pdf_hash TEXT PRIMARY KEY, resumen TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS summary_uploads (summary_id TEXT PRIMARY KEY, pdf_hash TEXT NOT NULL, owner TEXT NOT NULL, filename TEXT NOT NULL, created REAL NOT NULL)")
+            conn.execute("DROP INDEX IF EXISTS ix_summary_uploads_filename")  #reemplazado por el indice por dueño
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_summary_uploads_owner ON summary_uploads (owner, filename, created)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+        return conn
+
+    def _remember(self, pdf_hash, resumen):
+        with self._lock:
+            self._memory[pdf_hash] = resumen
+            self._memory.move_to_end(pdf_hash)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    #Resumen de un PDF por su hash o None si nunca se resumio
+    def get(self, pdf_hash):
+        with self._lock:
+            resumen = self._memory.get(pdf_hash)
+            if resumen is not None:
+                self._memory.move_to_end(pdf_hash)
+                self._stats["hits"] += 1
+                return resumen
+        with self._conn() as conn:
+            row = conn.execute("SELECT resumen FROM summaries WHERE pdf_hash = ?", (pdf_hash,)).fetchone()
+            if row:
+                conn.execute("UPDATE summaries SET last_used = ? WHERE pdf_hash = ?", (time.time(), pdf_hash))
+        with self._lock:
+            self._stats["hits" if row else "misses"] += 1
+        if row is None:
+            return None
+        self._remember(pdf_hash, row[0])
+        return row[0]
+
+    def put(self, pdf_hash, resumen):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO summaries (pdf_hash, resumen, created, last_used) VALUES (?, ?, ?, ?)", (pdf_hash, resumen, now, now))
+        self._remember(pdf_hash, resumen)
+        if now - self._last_sweep > self.SWEEP_EVERY:
+            self._last_sweep = now
+            self.sweep()
+
+    #Registra la subida del dueño y retorna su summary_id
+    def link(self, pdf_hash, owner, filename):
+        summary_id = hashlib.sha256(f'{owner}:{pdf_hash}'.encode('utf-8')).hexdigest()[:32]
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO summary_uploads (summary_id, pdf_hash, owner, filename, created) VALUES (?, ?, ?, ?, ?)",
+                         (summary_id, pdf_hash, owner, filename, time.time()))
+        return summary_id
+
+    #Retorna (filename, resumen) de una subida o None
+    def find(self, summary_id):
+        row = self._conn().execute("SELECT filename, pdf_hash FROM summary_uploads WHERE summary_id = ?", (summary_id,)).fetchone()
+        return self._found(row)
+
+    #Compatibilidad con clientes que solo envian el nombre del archivo: la subida mas reciente con ese nombre
+    #del mismo dueño, nunca la de otra persona que subio un archivo con el mismo nombre
+    def find_by_filename(self, filename, owner):
+        row = self._conn().execute("SELECT filename, pdf_hash FROM summary_uploads WHERE owner = ? AND filename = ? ORDER BY created DESC LIMIT 1",
+                                   (owner, filename)).fetchone()
+        return self._found(row)
+
+    def _found(self, row):
+        if row is None:
+            return None
+        resumen = self.get(row[1])
+        return (row[0], resumen) if resumen is not None else None
+
+    #Elimina los resumenes vencidos y los menos usados por encima de max_entries
+    def sweep(self):
+        with self._conn() as conn:
+            if self.ttl:
+                conn.execute("DELETE FROM summaries WHERE last_used < ?", (time.time() - self.ttl,))
+            if self.max_entries:
+                conn.execute("DELETE FROM summaries WHERE pdf_hash IN (SELECT pdf_hash FROM summaries ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            conn.execute("DELETE FROM summary_uploads WHERE pdf_hash NOT IN (SELECT pdf_hash FROM summaries)")
+        with self._lock:
+            self._memory.clear()  #los resumenes eliminados no deben seguir en memoria
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, memory_items=len(self._memory))
+
+#Crea el almacenamiento configurado con SUMMARY_STORE_PATH, SUMMARY_CACHE_ITEMS, SUMMARY_MAX_ENTRIES y SUMMARY_TTL_SECONDS
+def create_summary_store():
+    return SummaryStore(
+        os.getenv('SUMMARY_STORE_PATH', 'summaries.sqlite3'),
+        memory_items=int(os.getenv('SUMMARY_CACHE_ITEMS', '256')),
+        max_entries=int(os.getenv('SUMMARY_MAX_ENTRIES', '10000')),
+        ttl=int(os.getenv('SUMMARY_TTL_SECONDS', str(30 * 86400)))
+    )
@@ -0,0 +1,47 @@
+#Pruebas de la actualizacion incremental del indice del catalogo: releer desde la marca de agua (>=) no debe
+#duplicar documentos de las filas que no cambiaron
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog_index import CatalogIndex
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalogo.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE recursos_libros (id INTEGER PRIMARY KEY, titulo TEXT, autor TEXT, updated_at TEXT)"))
+        connection.execute(text("CREATE TABLE recursos_tesis (titulo TEXT, autor TEXT, updated_at TEXT)"))  #sin pk
+        connection.execute(text("INSERT INTO recursos_libros (titulo, autor, updated_at) VALUES "
+                                "('Suelos del sur', 'Lopez', '2026-01-01'), ('Riego', 'Perez', '2026-01-02'), ('Clima', 'Soto', '2026-01-02')"))
+        connection.execute(text("INSERT INTO recursos_tesis VALUES ('Tesis de suelos', 'Rojas', '2026-01-02'), ('Tesis de riego', 'Mora', '2026-01-02')"))
+    yield engine
+    engine.dispose()
+
+def live(index):
+    return len(index['documents']) - len(index['deleted'])
+
+def test_actualizar_sin_cambios_no_agrega_documentos(engine):
+    catalog = CatalogIndex(lambda: engine, ['recursos_libros', 'recursos_tesis'])
+    index = catalog.build()
+    assert len(index['documents']) == 5
+    for _ in range(2):
+        index = catalog.build(index)
+        assert len(index['documents']) == 5
+        assert not index['deleted']
+
+def test_actualizar_con_cambios(engine):
+    catalog = CatalogIndex(lambda: engine, ['recursos_libros', 'recursos_tesis'])
+    index = catalog.build()
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE recursos_libros SET titulo = 'Clima y suelos' WHERE autor = 'Soto'"))  #misma fecha
+        connection.execute(text("INSERT INTO recursos_tesis VALUES ('Tesis de clima', 'Vera', '2026-01-03')"))
+    index = catalog.build(index)
+    assert live(index) == 6
+    assert len(index['deleted']) == 1
+    titles = {row['titulo'] for doc, (_, row) in enumerate(index['documents']) if doc not in index['deleted']}
+    assert {'Clima y suelos', 'Tesis de clima'} <= titles and 'Clima' not in titles
+    index = catalog.build(index)
+    assert len(index['documents']) == 7
@@ -0,0 +1,58 @@
+#Pruebas del pool de extraccion de pdf_extract: un PDF colgado termina solo su proceso y el tiempo de cada
+#tarea empieza cuando un proceso la recibe, no mientras espera en la fila
+import os
+import sys
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_extract import ExtractPool
+
+#Las tareas corren en procesos "spawn": tienen que ser funciones de modulo
+def hang():
+    time.sleep(600)
+
+def work(value, seconds):
+    time.sleep(seconds)
+    return (value, os.getpid())
+
+def crash():
+    os._exit(1)
+
+@pytest.fixture
+def pool():
+    pool = ExtractPool(2, 0)
+    pool.warmup(os.getpid, 30)  #los procesos arrancan antes de medir tiempos
+    yield pool
+    pool.shutdown()
+
+def test_tareas_en_fila_detras_de_pdfs_colgados(pool):
+    with ThreadPoolExecutor(max_workers=8) as threads:
+        hung = [threads.submit(pool.run, 2, hang) for _ in range(2)]
+        time.sleep(0.5)  #los colgados toman los dos procesos
+        normal = [threads.submit(pool.run, 2, work, i, 1.2) for i in range(6)]  #cada una cabe en 2 s, la fila completa no
+        for future in hung:
+            with pytest.raises(TimeoutError):
+                future.result()
+        assert [future.result()[0] for future in normal] == list(range(6))
+    assert pool.stats()['killed'] == 2
+
+def test_un_pdf_colgado_no_termina_los_demas_procesos(pool):
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        hung = threads.submit(pool.run, 3, hang)
+        time.sleep(0.5)
+        normal = [threads.submit(pool.run, 3, work, i, 0.2) for i in range(4)]
+        results = [future.result() for future in normal]  #corren en el otro proceso mientras el colgado espera
+        assert not hung.done()
+        assert len({pid for _, pid in results}) == 1
+        with pytest.raises(TimeoutError):
+            hung.result()
+    assert pool.run(3, work, 'despues', 0)[0] == 'despues'
+
+def test_proceso_que_muere(pool):
+    with pytest.raises(EOFError):
+        pool.run(5, crash)
+    with pytest.raises(ZeroDivisionError):  #las excepciones de la tarea llegan tal cual y el proceso sigue
+        pool.run(5, divmod, 1, 0)
+    assert pool.run(5, work, 1, 0)[0] == 1
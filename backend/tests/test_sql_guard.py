@@ -0,0 +1,76 @@
+#Pruebas de sql_guard: reglas de guardQuery y control de costo con EXPLAIN
+#La prueba contra PostgreSQL real corre solo con TEST_DATABASE_URL=postgresql://... (se salta si no esta)
+import os
+import sys
+import json
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sql_guard
+from sql_guard import UnsafeQuery, checkCost, explainStatement, guardQuery, timeoutStatement
+
+COLUMNS = {'recursos_libros': ['id', 'titulo', 'autor', 'materia', 'editorial_id'], 'editoriales': ['id', 'nombre']}
+
+#Salida de EXPLAIN (FORMAT JSON) de PostgreSQL, recortada a lo que usa checkCost
+def plan(cost):
+    return [{"Plan": {"Node Type": "Seq Scan", "Relation Name": "recursos_libros", "Startup Cost": 0.0, "Total Cost": cost, "Plan Rows": 15}}]
+
+def test_explain_solo_en_postgresql(monkeypatch):
+    monkeypatch.setattr(sql_guard, 'SQL_MAX_COST', 1000.0)
+    assert explainStatement('postgresql', 'SELECT 1') == 'EXPLAIN (FORMAT JSON) SELECT 1'
+    assert explainStatement('sqlite', 'SELECT 1') is None
+    monkeypatch.setattr(sql_guard, 'SQL_MAX_COST', 0.0)
+    assert explainStatement('postgresql', 'SELECT 1') is None
+
+def test_costo_bajo_el_limite(monkeypatch):
+    monkeypatch.setattr(sql_guard, 'SQL_MAX_COST', 1000.0)
+    assert checkCost(plan(12.5)) == 12.5
+    assert checkCost(json.dumps(plan(12.5))) == 12.5  #algunos drivers retornan el JSON como texto
+
+def test_costo_sobre_el_limite(monkeypatch):
+    monkeypatch.setattr(sql_guard, 'SQL_MAX_COST', 1000.0)
+    with pytest.raises(UnsafeQuery):
+        checkCost(plan(250000.0))
+
+@pytest.mark.parametrize('sql_query', [
+    "SELECT * FROM recursos_libros l JOIN editoriales e ON 1=1 LIMIT 5",
+    "SELECT * FROM recursos_libros l JOIN editoriales e ON l.titulo LIKE e.nombre LIMIT 5",
+    "SELECT * FROM recursos_libros l JOIN editoriales e ON l.editorial_id = e.id OR 1=1 LIMIT 5",
+    "SELECT * FROM recursos_libros l CROSS JOIN editoriales e LIMIT 5",
+    "SELECT REPEAT(titulo, 100000) FROM recursos_libros LIMIT 5",
+    "SELECT pg_sleep(10) FROM recursos_libros LIMIT 5",
+    "SELECT * FROM recursos_libros LIMIT 15 OFFSET 1000000",
+    "DELETE FROM recursos_libros",
+])
+def test_consultas_rechazadas(sql_query):
+    with pytest.raises(UnsafeQuery):
+        guardQuery(sql_query, COLUMNS)
+
+@pytest.mark.parametrize('sql_query', [
+    "SELECT * FROM recursos_libros WHERE UPPER(UNACCENT(autor)) LIKE UPPER(UNACCENT('%Lopez%')) LIMIT 15",
+    "SELECT l.titulo, e.nombre FROM recursos_libros l JOIN editoriales e ON l.editorial_id = e.id LIMIT 5",
+    "SELECT COUNT(*), STRING_AGG(autor, ', ') FROM recursos_libros WHERE materia IS NOT NULL LIMIT 5",
+    "SELECT * FROM recursos_libros LIMIT 15 OFFSET 30",
+])
+def test_consultas_permitidas(sql_query):
+    assert guardQuery(sql_query, COLUMNS).startswith('SELECT')
+
+#Mismo camino que execute_query en server.py: timeout, EXPLAIN y checkCost en la transaccion de la consulta
+@pytest.mark.skipif(not os.getenv('TEST_DATABASE_URL', '').startswith('postgresql'), reason='requiere TEST_DATABASE_URL de PostgreSQL')
+def test_costo_con_postgresql(monkeypatch):
+    from sqlalchemy import create_engine, text
+    engine = create_engine(os.environ['TEST_DATABASE_URL'])
+    try:
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TEMP TABLE recursos_libros (id serial PRIMARY KEY, titulo text, autor text, materia text, editorial_id int) ON COMMIT DROP"))
+            connection.execute(text("INSERT INTO recursos_libros (titulo, autor) SELECT 'titulo ' || n, 'autor ' || n FROM generate_series(1, 5000) n"))
+            connection.execute(text("ANALYZE recursos_libros"))
+            connection.execute(text(timeoutStatement('postgresql') or 'SELECT 1'))
+            barata = guardQuery("SELECT titulo FROM recursos_libros WHERE id = 7 LIMIT 15", COLUMNS)
+            cara = guardQuery("SELECT a.titulo FROM recursos_libros a JOIN recursos_libros b ON a.id = b.editorial_id ORDER BY a.titulo LIMIT 15", COLUMNS)
+            monkeypatch.setattr(sql_guard, 'SQL_MAX_COST', 50.0)
+            assert checkCost(connection.execute(text(explainStatement('postgresql', barata))).scalar()) <= 50.0
+            with pytest.raises(UnsafeQuery):
+                checkCost(connection.execute(text(explainStatement('postgresql', cara))).scalar())
+    finally:
+        engine.dispose()
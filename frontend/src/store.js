@@ -7,6 +7,10 @@ export const isLoggedIn = writable(false);
 export const showOptions = writable(true); //Mostrar o no, las opciones del chatbot
 export const selectedOption = writable(null); //Opcion seleccionada
 
+// Id de la conversacion del invitado, cada pestaña tiene su propia sesion en el servidor
+export const guestSession = sessionStorage.getItem('guest_session') || crypto.randomUUID();
+sessionStorage.setItem('guest_session', guestSession);
+
     // Función para manejar el inicio de sesión
 export async function login(email, password) {
     const response = await fetch('http://127.0.0.1:5000/login', {